@@ -1,14 +1,19 @@
 import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pickle
-import pandas as pd
 from werkzeug.utils import secure_filename
 from label_reader import FoodLabelReader
 from ai_service import initialize_ai_service, get_ai_service
+from food_catalog import get_food_catalog, parse_filter_args, NUTRIENT_RESULT_FIELDS
+from inference import (
+    FOOD_MODEL_FILES, USER_MODEL_FILES, format_prediction, load_food_risk_model, load_user_risk_model
+)
+from model_registry import ModelRegistry
 from dotenv import load_dotenv
 import time
 import tempfile
+import json
+import re
 from pathlib import Path
 
 # Load environment variables
@@ -172,17 +177,31 @@ if ai_api_key:
 else:
     print("⚠️ AI_API_KEY not found in environment variables")
 
+# Reloads the food model in the background when its files change (MODEL_RELOAD_INTERVAL seconds, 0 disables)
+model_registry = ModelRegistry.from_env()
+
 try:
     print("Loading model and encoders...")
-    model = pickle.load(open("models/food_analysis_model.pkl", "rb"))
-    label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
-    label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
-    feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
-    food_db = pd.read_csv("data/food_database_fixed.csv")
+    food_catalog = get_food_catalog("data/food_database_fixed.csv")
+    # Every catalog row is scored at load time so name-based analysis is a lookup
+    risk_model = model_registry.register(
+        "food", lambda: load_food_risk_model(catalog=food_catalog), FOOD_MODEL_FILES
+    )
     print("✅ Model and encoders loaded successfully.")
+    print(f"✅ Precomputed disease-risk predictions for {len(risk_model.catalog_predictions)} catalog foods.")
 except Exception as e:
     print(f"❌ Error loading model or data: {e}")
 
+# The user-nutrition model answers /food/predict-disease locally unless DISEASE_PREDICTION_MODE=ai
+DISEASE_PREDICTION_MODE = os.getenv('DISEASE_PREDICTION_MODE', 'model').lower()
+
+try:
+    print("Loading user disease-risk model...")
+    model_registry.register("user", load_user_risk_model, USER_MODEL_FILES)
+    print("✅ User disease-risk model loaded successfully.")
+except Exception as e:
+    print(f"❌ Error loading user disease-risk model: {e}")
+
 def allowed_file(filename):
     """Check if the uploaded file has an allowed extension"""
     return '.' in filename and \
@@ -250,6 +269,57 @@ def generate_recommendations(nutritional_data, category, processing_level):
     
     return recommendations
 
+# Response schema for database search results: catalog column and cast per field
+FOOD_SEARCH_FIELDS = {
+    'Food Name': ('Food_Name', None),
+    'Category': ('Food_Category', None),
+    'Calories': ('Calories_per_100g', int),
+    'Protein': ('Protein_per_100g', int),
+    'Carbohydrates': ('Carbs_per_100g', int),
+    'Fat': ('Fat_per_100g', int),
+    'Fiber': ('Fiber_per_100g', int),
+    'Sugar': ('Sugar_per_100g', int),
+    'Sodium': ('Sodium_per_100g', int)
+}
+
+# Fields the catalog has no data for, identical for every database result
+FOOD_SEARCH_PADDING = {
+    'Processing Level': 'Processed',
+    'Nutritional Density': 'Medium',
+    'Vitamin C': 0,
+    'Vitamin A': 0,
+    'Calcium': 0,
+    'Iron': 0,
+    'Potassium': 0,
+    'Magnesium': 0,
+    'Zinc': 0
+}
+
+def serialize_search_results(row_ids):
+    """Serialize catalog rows into the /food/search result schema"""
+    return food_catalog.serialize(row_ids, FOOD_SEARCH_FIELDS, FOOD_SEARCH_PADDING)
+
+def get_nutritional_density_text(density):
+    """Convert nutritional density score (1-10) to text"""
+    if density >= 8:
+        return "High"
+    elif density >= 5:
+        return "Medium"
+    else:
+        return "Low"
+
+def serialize_healthy_foods(row_ids):
+    """Serialize ranked catalog rows into the /food/healthy result schema"""
+    results = food_catalog.serialize(row_ids, FOOD_SEARCH_FIELDS, FOOD_SEARCH_PADDING)
+    levels = food_catalog.serialize(row_ids, {
+        'Processing Level': ('Processing_Level', int),
+        'Nutritional Density': ('Nutritional_Density', int)
+    })
+    for result, level in zip(results, levels):
+        result['Processing Level'] = get_processing_level_text(level['Processing Level'])
+        result['Nutritional Density'] = get_nutritional_density_text(level['Nutritional Density'])
+    return results
+
 @app.route("/api/scan_label", methods=["POST"])
 def scan_label():
     """OCR endpoint to scan food labels and extract nutritional information"""
@@ -327,9 +397,66 @@ def scan_label():
 @app.route("/api/search_food", methods=["GET"])
 def search_food():
     query = request.args.get("query", "")
-    matches = food_db[food_db['Food_Name'].str.lower().str.contains(query.lower(), na=False)]
+    matches = food_catalog.rows(food_catalog.search(query, limit=10))
     return matches[['Food_Name', 'Food_Category', 'Calories_per_100g']].head(10).to_json(orient="records")
 
+@app.route("/api/food/autocomplete", methods=["GET"])
+def autocomplete_food():
+    """Prefix completions over food names and categories, best-ranked first"""
+    prefix = request.args.get("query", "")
+    limit = min(max(request.args.get("limit", 8, type=int), 1), 25)
+    row_ids = food_catalog.autocomplete(prefix, limit=limit)
+    matches = food_catalog.rows(row_ids)
+    results = [
+        {"id": row_id, "name": name, "category": category}
+        for row_id, name, category in zip(row_ids, matches['Food_Name'], matches['Food_Category'])
+    ]
+    return jsonify({
+        "query": prefix,
+        "results": results,
+        "count": len(results)
+    })
+
+@app.route("/api/food/filter", methods=["GET"])
+def filter_food():
+    """Nutrient range query, e.g. ?protein_min=20&sugar_max=5&category=Dairy&sort=sodium"""
+    try:
+        filters = parse_filter_args(request.args)
+        limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+        offset = max(request.args.get("cursor", 0, type=int), 0)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    row_ids = food_catalog.filter(**filters)
+    page = row_ids[offset:offset + limit]
+    next_offset = offset + len(page)
+    return jsonify({
+        "results": food_catalog.serialize(page, NUTRIENT_RESULT_FIELDS, id_key="id"),
+        "count": len(page),
+        "total_found": len(row_ids),
+        "next_cursor": str(next_offset) if next_offset < len(row_ids) else None
+    })
+
+@app.route("/api/food/<int:food_id>/similar", methods=["GET"])
+def similar_foods(food_id):
+    """Nearest catalog items in nutrient space; ?healthier=true keeps only better-ranked ones"""
+    if food_id >= len(food_catalog):
+        return jsonify({"error": "Food item not found"}), 404
+
+    k = min(max(request.args.get("k", 5, type=int), 1), 50)
+    healthier = request.args.get("healthier", "false").lower() == "true"
+    neighbors = food_catalog.similar(food_id, k=k, healthier=healthier)
+    results = food_catalog.serialize([row_id for row_id, _ in neighbors], NUTRIENT_RESULT_FIELDS, id_key="id")
+    for result, (_, distance) in zip(results, neighbors):
+        result["distance"] = round(distance, 4)
+
+    return jsonify({
+        "food_id": food_id,
+        "name": food_catalog.names[food_id],
+        "results": results,
+        "count": len(results)
+    })
+
 @app.route("/food/categories", methods=["GET"])
 def get_food_categories():
     """Get available food categories"""
@@ -371,32 +498,10 @@ def food_search_ai():
         ai_model = get_ai_service()
         if not ai_model:
             # Fallback to database search
-            matches = food_db[food_db['Food_Name'].str.lower().str.contains(query.lower(), na=False)]
+            row_ids = food_catalog.search(query)
             if category and category != 'all':
-                matches = matches[matches['Food_Category'].str.lower().str.contains(category.lower(), na=False)]
-            
-            results = []
-            for _, row in matches.head(10).iterrows():
-                results.append({
-                    'Food Name': row.get('Food_Name', ''),
-                    'Category': row.get('Food_Category', ''),
-                    'Processing Level': 'Processed',
-                    'Nutritional Density': 'Medium',
-                    'Calories': int(row.get('Calories_per_100g', 0)),
-                    'Protein': int(row.get('Protein_per_100g', 0)),
-                    'Carbohydrates': int(row.get('Carbs_per_100g', 0)),
-                    'Fat': int(row.get('Fat_per_100g', 0)),
-                    'Fiber': int(row.get('Fiber_per_100g', 0)),
-                    'Sugar': int(row.get('Sugar_per_100g', 0)),
-                    'Sodium': int(row.get('Sodium_per_100g', 0)),
-                    'Vitamin C': 0,
-                    'Vitamin A': 0,
-                    'Calcium': 0,
-                    'Iron': 0,
-                    'Potassium': 0,
-                    'Magnesium': 0,
-                    'Zinc': 0
-                })
+                row_ids = food_catalog.filter_category(row_ids, category)
+            results = serialize_search_results(row_ids[:10])
             
             return jsonify({
                 "success": True,
@@ -467,32 +572,10 @@ def food_search_ai():
         except Exception as ai_error:
             print(f"AI search error: {ai_error}")
             # Fallback to database search
-            matches = food_db[food_db['Food_Name'].str.lower().str.contains(query.lower(), na=False)]
+            row_ids = food_catalog.search(query)
             if category and category != 'all':
-                matches = matches[matches['Food_Category'].str.lower().str.contains(category.lower(), na=False)]
-            
-            results = []
-            for _, row in matches.head(8).iterrows():
-                results.append({
-                    'Food Name': row.get('Food_Name', ''),
-                    'Category': row.get('Food_Category', ''),
-                    'Processing Level': 'Processed',
-                    'Nutritional Density': 'Medium',
-                    'Calories': int(row.get('Calories_per_100g', 0)),
-                    'Protein': int(row.get('Protein_per_100g', 0)),
-                    'Carbohydrates': int(row.get('Carbs_per_100g', 0)),
-                    'Fat': int(row.get('Fat_per_100g', 0)),
-                    'Fiber': int(row.get('Fiber_per_100g', 0)),
-                    'Sugar': int(row.get('Sugar_per_100g', 0)),
-                    'Sodium': int(row.get('Sodium_per_100g', 0)),
-                    'Vitamin C': 0,
-                    'Vitamin A': 0,
-                    'Calcium': 0,
-                    'Iron': 0,
-                    'Potassium': 0,
-                    'Magnesium': 0,
-                    'Zinc': 0
-                })
+                row_ids = food_catalog.filter_category(row_ids, category)
+            results = serialize_search_results(row_ids[:8])
             
             return jsonify({
                 "success": True,
@@ -508,22 +591,16 @@ def food_search_ai():
 
 @app.route("/food/healthy", methods=["GET"])
 def get_healthy_foods():
-    """Get recommended healthy foods using AI"""
+    """Get recommended healthy foods from the precomputed catalog rankings (?ai=true asks Gemini instead)"""
     try:
         limit = int(request.args.get("limit", 6))
+        category = request.args.get("category", "").strip() or None
+        use_ai = request.args.get("ai", "false").lower() == "true"
         
-        # Get AI service
-        ai_model = get_ai_service()
+        # Gemini is opt-in enrichment; the catalog rankings are the default path
+        ai_model = get_ai_service() if use_ai else None
         if not ai_model:
-            # Fallback healthy foods from database
-            healthy_foods = [
-                {"Food Name": "Spinach", "Category": "Vegetables", "Calories": 23, "Protein": 2.9, "Nutritional Density": "High"},
-                {"Food Name": "Blueberries", "Category": "Fruits", "Calories": 57, "Protein": 0.7, "Nutritional Density": "High"},
-                {"Food Name": "Salmon", "Category": "Proteins", "Calories": 208, "Protein": 20.4, "Nutritional Density": "High"},
-                {"Food Name": "Greek Yogurt", "Category": "Dairy", "Calories": 59, "Protein": 10.2, "Nutritional Density": "High"},
-                {"Food Name": "Quinoa", "Category": "Grains", "Calories": 120, "Protein": 4.4, "Nutritional Density": "High"},
-                {"Food Name": "Avocado", "Category": "Fruits", "Calories": 160, "Protein": 2.0, "Nutritional Density": "High"}
-            ][:limit]
+            healthy_foods = serialize_healthy_foods(food_catalog.top_healthy(category=category, limit=limit))
             
             return jsonify({
                 "success": True,
@@ -588,15 +665,8 @@ def get_healthy_foods():
                 
         except Exception as ai_error:
             print(f"AI healthy foods error: {ai_error}")
-            # Fallback to predefined healthy foods
-            healthy_foods = [
-                {"Food Name": "Kale", "Category": "Vegetables", "Calories": 35, "Protein": 3.3, "Nutritional Density": "High"},
-                {"Food Name": "Wild Blueberries", "Category": "Fruits", "Calories": 57, "Protein": 0.7, "Nutritional Density": "High"},
-                {"Food Name": "Wild Salmon", "Category": "Seafood", "Calories": 208, "Protein": 20.4, "Nutritional Density": "High"},
-                {"Food Name": "Greek Yogurt", "Category": "Dairy", "Calories": 59, "Protein": 10.2, "Nutritional Density": "High"},
-                {"Food Name": "Quinoa", "Category": "Grains", "Calories": 120, "Protein": 4.4, "Nutritional Density": "High"},
-                {"Food Name": "Avocado", "Category": "Fruits", "Calories": 160, "Protein": 2.0, "Nutritional Density": "High"}
-            ][:limit]
+            # Fallback to the catalog rankings
+            healthy_foods = serialize_healthy_foods(food_catalog.top_healthy(category=category, limit=limit))
             
             return jsonify({
                 "success": True,
@@ -734,36 +804,93 @@ def analyze_food():
     data = request.json
     food_name = data.get("food_name")
     nutritional_data = data.get("nutritional_data")
+    risk_model = model_registry.get("food")
 
-    # If food_name is given, get its data from DB
+    # If food_name is in the DB (tolerating typos and OCR noise), serve its precomputed prediction
     if food_name:
-        row = food_db[food_db['Food_Name'].str.lower() == food_name.lower()]
-        if not row.empty:
-            nutritional_data = row.iloc[0][feature_cols].to_dict()
+        row_id = food_catalog.lookup(food_name)
+        if row_id is not None:
+            return jsonify({
+                "food_name": food_name,
+                "matched_food": food_catalog.names[row_id],
+                **risk_model.catalog_predictions.get(row_id)
+            })
 
     if nutritional_data is None:
         return jsonify({"error": "No nutritional data provided"}), 400
 
-    # Prepare DataFrame
-    df = pd.DataFrame([nutritional_data])
-    # Encode categorical features
-    for col in df.select_dtypes(include=["object"]).columns:
-        if col in label_encoders:
-            le = label_encoders[col]
-            df[col] = le.transform(df[col].astype(str))
-
-    # Predict
-    pred = model.predict(df[feature_cols])
-    probabilities = model.predict_proba(df[feature_cols])[0]
-    max_prob = max(probabilities)
-    predicted_disease = label_encoder_y.inverse_transform(pred)[0]
-    all_probs = dict(zip(label_encoder_y.classes_, probabilities))
+    # Encode straight into a float32 feature row and predict once
+    try:
+        prediction = risk_model.predict_one(nutritional_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     return jsonify({
         "food_name": food_name or nutritional_data.get("Food_Name", "Unknown"),
-        "predicted_disease": predicted_disease,
-        "confidence": max_prob,
-        "all_probabilities": all_probs
+        "matched_food": None,
+        **prediction
+    })
+
+MAX_BATCH_ITEMS = 500
+
+@app.route("/api/analyze_food/batch", methods=["POST"])
+def analyze_food_batch():
+    """Analyze many foods at once: catalog names are looked up, custom payloads share one model call"""
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide a non-empty list of items"}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"At most {MAX_BATCH_ITEMS} items per batch"}), 400
+
+    risk_model = model_registry.get("food")
+    results = [None] * len(items)
+    custom_positions = []
+    custom_payloads = []
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"food_name": item}
+        if not isinstance(item, dict):
+            results[i] = {"index": i, "error": "Item must be a food name or an object"}
+            continue
+
+        food_name = item.get("food_name")
+        nutritional_data = item.get("nutritional_data")
+        if food_name:
+            row_id = food_catalog.lookup(food_name)
+            if row_id is not None:
+                results[i] = {
+                    "index": i,
+                    "food_name": food_name,
+                    "matched_food": food_catalog.names[row_id],
+                    **risk_model.catalog_predictions.get(row_id)
+                }
+                continue
+        if nutritional_data is None:
+            results[i] = {"index": i, "food_name": food_name, "error": "Food not found and no nutritional data provided"}
+            continue
+        custom_positions.append(i)
+        custom_payloads.append(nutritional_data)
+
+    # Score every valid custom payload in a single model call
+    X, errors = risk_model.vectorizer.transform_each(custom_payloads)
+    probabilities = iter(risk_model.predict_proba(X) if len(X) else [])
+    for i, payload, error in zip(custom_positions, custom_payloads, errors):
+        food_name = items[i].get("food_name") or (payload.get("Food_Name", "Unknown") if isinstance(payload, dict) else "Unknown")
+        if error is not None:
+            results[i] = {"index": i, "food_name": food_name, "error": error}
+        else:
+            results[i] = {
+                "index": i,
+                "food_name": food_name,
+                "matched_food": None,
+                **format_prediction(next(probabilities), risk_model.classes)
+            }
+
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "errors": sum(1 for result in results if "error" in result)
     })
 
 @app.route("/api/ai_analyze", methods=["POST"])
@@ -913,31 +1040,9 @@ def nutrition_scan():
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-@app.route("/food/predict-disease", methods=["POST"])
-def predict_disease():
-    """AI-powered health analysis and disease prediction endpoint"""
-    try:
-        if not request.is_json:
-            return jsonify({"error": "Request must be JSON"}), 400
-        
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ["Ages", "Gender", "Height", "Weight", "Activity Level", 
-                          "Dietary Preference", "Daily Calorie Target", "Protein", 
-                          "Sugar", "Sodium", "Calories", "Carbohydrates", "Fiber", "Fat"]
-        
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            return jsonify({"error": f"Missing required fields: {missing_fields}"}), 400
-        
-        # Get AI service
-        ai_model = get_ai_service()
-        if not ai_model:
-            return jsonify({"error": "AI model service not available"}), 503
-        
-        # Create comprehensive health analysis prompt
-        prompt = f"""
+def build_health_analysis_prompt(data):
+    """Gemini prompt asking for a JSON health assessment of a /food/predict-disease request"""
+    return f"""
         Analyze the following health and nutritional data to provide a comprehensive health assessment:
 
         PERSONAL INFORMATION:
@@ -986,54 +1091,212 @@ def predict_disease():
 
         Base your analysis on established medical and nutritional guidelines. Consider BMI, caloric balance, nutrient ratios, activity level, and age-specific health risks.
         """
+
+def parse_health_analysis(analysis_result):
+    """
+    Frontend-ready fields from a Gemini health analysis response.
+
+    Returns:
+        dict or None: None if the response contains no JSON object
+    """
+    # Extract JSON from response
+    json_match = re.search(r'\{.*\}', analysis_result, re.DOTALL)
+    if not json_match:
+        return None
+    analysis_json = json.loads(json_match.group())
+
+    # Ensure required fields exist and format properly for frontend
+    raw_probabilities = analysis_json.get("all_probabilities", {})
+
+    # Convert probabilities to decimal format (0-1) expected by frontend
+    formatted_probabilities = {}
+    for condition, prob in raw_probabilities.items():
+        # Convert to decimal if it's a percentage (>1), otherwise keep as is
+        prob_value = float(prob)
+        converted_prob = prob_value / 100.0 if prob_value > 1 else prob_value
+        formatted_probabilities[condition] = converted_prob
+
+    # Handle confidence conversion
+    raw_confidence = analysis_json.get("confidence", 75)
+    confidence_value = float(raw_confidence)
+    formatted_confidence = confidence_value / 100.0 if confidence_value > 1 else confidence_value
+
+    return {
+        "predicted_disease": analysis_json.get("predicted_disease", "Unknown"),
+        "confidence": formatted_confidence,
+        "risk_level": analysis_json.get("risk_level", "Medium"),
+        "all_probabilities": formatted_probabilities,
+        "recommendations": analysis_json.get("recommendations", [
+            "Maintain a balanced diet with adequate fruits and vegetables",
+            "Engage in regular physical activity as per your activity level",
+            "Monitor your weight and BMI regularly",
+            "Stay hydrated and limit processed foods",
+            "Consult healthcare providers for regular check-ups"
+        ]),
+        "bmi_analysis": analysis_json.get("bmi_analysis", "BMI analysis not available"),
+        "calorie_balance": analysis_json.get("calorie_balance", "Calorie balance analysis not available"),
+        "nutrient_balance": analysis_json.get("nutrient_balance", "Nutrient balance analysis not available"),
+        "health_score": int(analysis_json.get("health_score", 75))
+    }
+
+def classify_bmi(weight, height):
+    """BMI, primary weight concern and its risk level from weight in kg and height in cm"""
+    bmi = weight / ((height / 100) ** 2)
+
+    if bmi < 18.5:
+        primary_concern = "Underweight"
+        risk_level = "Medium"
+    elif bmi > 30:
+        primary_concern = "Obesity"
+        risk_level = "High"
+    elif bmi > 25:
+        primary_concern = "Overweight"
+        risk_level = "Medium"
+    else:
+        primary_concern = "Healthy Weight"
+        risk_level = "Low"
+    return bmi, primary_concern, risk_level
+
+def get_risk_level(confidence):
+    """Risk level for a model prediction from its confidence"""
+    if confidence > 0.8:
+        return "High"
+    elif confidence > 0.6:
+        return "Medium"
+    return "Low"
+
+# Fields every /food/predict-disease request must carry
+HEALTH_PROFILE_FIELDS = ["Ages", "Gender", "Height", "Weight", "Activity Level", 
+                         "Dietary Preference", "Daily Calorie Target", "Protein", 
+                         "Sugar", "Sodium", "Calories", "Carbohydrates", "Fiber", "Fat"]
+
+# Profile fields that must be numbers, as predict_disease_locally reads them
+HEALTH_PROFILE_NUMERIC_FIELDS = ["Ages", "Height", "Weight", "Daily Calorie Target", "Protein",
+                                 "Sugar", "Sodium", "Calories", "Carbohydrates", "Fiber", "Fat"]
+
+def narrative_request_error(data):
+    """
+    Validation error for a /food/predict-disease/narrative body.
+
+    Returns:
+        str or None: Message for a 400 response, None if the body is usable
+    """
+    if not isinstance(data, dict):
+        return "Request body must be a JSON object"
+    missing_fields = [field for field in HEALTH_PROFILE_FIELDS if field not in data]
+    if missing_fields:
+        return f"Missing required fields: {missing_fields}"
+    for field in HEALTH_PROFILE_NUMERIC_FIELDS:
+        try:
+            float(data[field])
+        except (TypeError, ValueError):
+            return f"{field} must be a number"
+    prediction = data.get("prediction")
+    if prediction is None:
+        return None
+    if not isinstance(prediction, dict) or "predicted_disease" not in prediction or "confidence" not in prediction:
+        return "prediction must contain predicted_disease and confidence"
+    if not isinstance(prediction["predicted_disease"], str):
+        return "prediction.predicted_disease must be a string"
+    try:
+        confidence = float(prediction["confidence"])
+    except (TypeError, ValueError):
+        return "prediction.confidence must be a number"
+    if not 0.0 <= confidence <= 1.0:
+        return "prediction.confidence must be between 0 and 1"
+    return None
+
+def health_narrative_prompt(data, prediction):
+    """Gemini prompt for a request the local model already answered, with its prediction as context"""
+    return build_health_analysis_prompt(data) + f"""
+        A local risk model trained on similar profiles predicted "{prediction['predicted_disease']}"
+        with {float(prediction['confidence']):.0%} confidence; take this into account.
+        """
+
+def predict_disease_locally(user_model, data):
+    """
+    /food/predict-disease response from the local user-nutrition model.
+
+    Meal columns the request omits are filled from the training-time defaults.
+
+    Raises:
+        ValueError: If a feature is non-numeric or an unknown category
+    """
+    user_data = user_model.with_defaults(data)
+    prediction = user_model.predict_one(user_data)
+    bmi, weight_status, _ = classify_bmi(float(data['Weight']), float(data['Height']))
+    calories, target = float(data['Calories']), float(data['Daily Calorie Target'])
+    macro_calories = 4 * float(data['Protein']) + 4 * float(data['Carbohydrates']) + 9 * float(data['Fat'])
+    shares = {
+        name: (grams * factor / macro_calories if macro_calories else 0.0)
+        for name, grams, factor in [
+            ("protein", float(data['Protein']), 4),
+            ("carbohydrates", float(data['Carbohydrates']), 4),
+            ("fat", float(data['Fat']), 9)
+        ]
+    }
+    conditions = [condition.strip() for condition in prediction["predicted_disease"].split(",")]
+    return {
+        **prediction,
+        "risk_level": get_risk_level(prediction["confidence"]),
+        "recommendations": [
+            f"Discuss screening for {', '.join(conditions)} with a healthcare provider",
+            "Keep daily calories close to your target" if abs(calories - target) <= 0.1 * target
+            else f"Bring daily calories ({calories:.0f} kcal) closer to your target ({target:.0f} kcal)",
+            "Limit added sugar and sodium",
+            "Increase fiber intake with vegetables, legumes and whole grains",
+            "Engage in regular physical activity as per your activity level"
+        ],
+        "bmi_analysis": f"Your BMI is {bmi:.1f}, classified as {weight_status}",
+        "calorie_balance": f"Daily intake: {calories:.0f} kcal vs target: {target:.0f} kcal ({calories - target:+.0f} kcal)",
+        "nutrient_balance": ", ".join(f"{share:.0%} of calories from {name}" for name, share in shares.items()),
+        "health_score": 85 if 18.5 <= bmi <= 25 else 65,
+        "source": "model",
+        "model_version": model_registry.version("user")
+    }
+
+@app.route("/food/predict-disease", methods=["POST"])
+def predict_disease():
+    """
+    Health analysis and disease prediction endpoint.
+
+    Answered by the local user-nutrition model unless DISEASE_PREDICTION_MODE=ai
+    or the model is unavailable. The optional AI narrative is a separate call to
+    /food/predict-disease/narrative, so it never delays this response.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+        
+        data = request.get_json()
+        
+        # Validate required fields
+        missing_fields = [field for field in HEALTH_PROFILE_FIELDS if field not in data]
+        if missing_fields:
+            return jsonify({"error": f"Missing required fields: {missing_fields}"}), 400
+        
+        user_model = model_registry.get("user")
+        if DISEASE_PREDICTION_MODE != "ai" and user_model:
+            try:
+                result = predict_disease_locally(user_model, data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify(result)
+        
+        # Get AI service
+        ai_model = get_ai_service()
+        if not ai_model:
+            return jsonify({"error": "AI model service not available"}), 503
+        
+        # Create comprehensive health analysis prompt
+        prompt = build_health_analysis_prompt(data)
         
         try:
             # Get AI analysis
             analysis_result = ai_model.analyze_text(prompt)
             
-            # Parse JSON response
-            import json
-            import re
-            
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', analysis_result, re.DOTALL)
-            if json_match:
-                analysis_json = json.loads(json_match.group())
-                
-                # Ensure required fields exist and format properly for frontend
-                raw_probabilities = analysis_json.get("all_probabilities", {})
-                
-                # Convert probabilities to decimal format (0-1) expected by frontend
-                formatted_probabilities = {}
-                for condition, prob in raw_probabilities.items():
-                    # Convert to decimal if it's a percentage (>1), otherwise keep as is
-                    prob_value = float(prob)
-                    converted_prob = prob_value / 100.0 if prob_value > 1 else prob_value
-                    formatted_probabilities[condition] = converted_prob
-                
-                # Handle confidence conversion
-                raw_confidence = analysis_json.get("confidence", 75)
-                confidence_value = float(raw_confidence)
-                formatted_confidence = confidence_value / 100.0 if confidence_value > 1 else confidence_value
-                
-                result = {
-                    "predicted_disease": analysis_json.get("predicted_disease", "Unknown"),
-                    "confidence": formatted_confidence,
-                    "risk_level": analysis_json.get("risk_level", "Medium"),
-                    "all_probabilities": formatted_probabilities,
-                    "recommendations": analysis_json.get("recommendations", [
-                        "Maintain a balanced diet with adequate fruits and vegetables",
-                        "Engage in regular physical activity as per your activity level",
-                        "Monitor your weight and BMI regularly",
-                        "Stay hydrated and limit processed foods",
-                        "Consult healthcare providers for regular check-ups"
-                    ]),
-                    "bmi_analysis": analysis_json.get("bmi_analysis", "BMI analysis not available"),
-                    "calorie_balance": analysis_json.get("calorie_balance", "Calorie balance analysis not available"),
-                    "nutrient_balance": analysis_json.get("nutrient_balance", "Nutrient balance analysis not available"),
-                    "health_score": int(analysis_json.get("health_score", 75))
-                }
-                
+            result = parse_health_analysis(analysis_result)
+            if result:
                 return jsonify(result)
             else:
                 # Fallback if JSON parsing fails
@@ -1065,20 +1328,7 @@ def predict_disease():
         except Exception as ai_error:
             print(f"AI analysis error: {ai_error}")
             # Return basic analysis if AI fails
-            bmi = data['Weight'] / ((data['Height'] / 100) ** 2)
-            
-            if bmi < 18.5:
-                primary_concern = "Underweight"
-                risk_level = "Medium"
-            elif bmi > 30:
-                primary_concern = "Obesity"
-                risk_level = "High"
-            elif bmi > 25:
-                primary_concern = "Overweight"
-                risk_level = "Medium"
-            else:
-                primary_concern = "Healthy Weight"
-                risk_level = "Low"
+            bmi, primary_concern, risk_level = classify_bmi(data['Weight'], data['Height'])
             
             return jsonify({
                 "predicted_disease": primary_concern,
@@ -1109,6 +1359,51 @@ def predict_disease():
         print(f"Health analysis error: {e}")
         return jsonify({"error": f"Health analysis failed: {str(e)}"}), 500
 
+@app.route("/food/predict-disease/narrative", methods=["POST"])
+def health_narrative():
+    """
+    Optional AI narrative for a /food/predict-disease result.
+
+    The client sends the same profile it sent to /food/predict-disease, optionally
+    with that response's predicted_disease and confidence under "prediction"; the
+    request is self-contained, so any worker can serve it. The response is
+    {"narrative": ...}: the parsed analysis fields, or Gemini's raw text when its
+    reply holds no JSON object.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+        
+        data = request.get_json()
+        error = narrative_request_error(data)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        ai_model = get_ai_service()
+        if not ai_model:
+            return jsonify({"error": "AI model service not available"}), 503
+        
+        prediction = data.get("prediction")
+        if not prediction:
+            user_model = model_registry.get("user")
+            if not user_model:
+                return jsonify({"error": "Prediction model not available"}), 503
+            try:
+                prediction = user_model.predict_one(user_model.with_defaults(data))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
+        analysis_result = ai_model.analyze_text(health_narrative_prompt(data, prediction))
+        try:
+            narrative = parse_health_analysis(analysis_result)
+        except ValueError:
+            narrative = None
+        # Without a JSON object in the reply, the raw text is the narrative
+        return jsonify({"narrative": narrative if narrative else analysis_result})
+    except Exception as e:
+        print(f"AI narrative error: {e}")
+        return jsonify({"error": f"AI narrative failed: {str(e)}"}), 502
+
 @app.route("/")
 def home():
     return "Food Scanner API is running!"
@@ -1116,16 +1411,27 @@ def home():
 @app.route("/health")
 def health_check():
     ai_model = get_ai_service()
+    risk_model = model_registry.get("food")
     return jsonify({
         "status": "healthy", 
         "message": "Food Scanner API is running",
         "ai_model_available": ai_model is not None,
+        "models": model_registry.info(),
+        "disease_prediction_mode": DISEASE_PREDICTION_MODE,
+        "inference_batching": risk_model.batcher.metrics() if risk_model else None,
+        "prediction_cache": risk_model.cache.metrics() if risk_model and risk_model.cache else None,
+        "ocr": label_reader.ocr_info(),
         "endpoints": [
             "/api/ai_analyze - AI model food analysis",
             "/api/nutrition_scan - AI model nutrition label extraction",
             "/api/scan_label - Traditional OCR scanning",
             "/api/analyze_food - ML model analysis",
-            "/food/predict-disease - AI health analysis and disease prediction"
+            "/api/analyze_food/batch - Batch ML model analysis",
+            "/api/food/autocomplete - Food name autocomplete",
+            "/api/food/filter - Nutrient range filter",
+            "/api/food/<id>/similar - Nutritionally similar foods",
+            "/food/predict-disease - Local-model health analysis and disease prediction",
+            "/food/predict-disease/narrative - Optional AI narrative for a prediction"
         ]
     })
 
@@ -0,0 +1,317 @@
+"""
+Shared columnar food catalog
+Loads a food database CSV once per process into typed columns and exposes the
+lookup, filter and serialization helpers used by the API servers and the CLI
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from food_index import TrigramIndex, PrefixIndex, FuzzyIndex, NutrientIndex, SimilarityIndex, normalize_name, health_rank_scores
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = "data/food_database_fixed.csv"
+
+FLOAT_COLUMNS = [
+    'Calories_per_100g', 'Protein_per_100g', 'Carbs_per_100g', 'Fat_per_100g',
+    'Fiber_per_100g', 'Sugar_per_100g', 'Sodium_per_100g'
+]
+INT_COLUMNS = ['Processing_Level', 'Nutritional_Density', 'Glycemic_Index', 'Additives_Count']
+CATEGORICAL_COLUMNS = ['Food_Category', 'Disease_Risk']
+
+# Query-string names for the range-filterable columns
+NUTRIENT_FIELDS = {
+    'calories': 'Calories_per_100g',
+    'protein': 'Protein_per_100g',
+    'carbs': 'Carbs_per_100g',
+    'fat': 'Fat_per_100g',
+    'fiber': 'Fiber_per_100g',
+    'sugar': 'Sugar_per_100g',
+    'sodium': 'Sodium_per_100g',
+    'processing_level': 'Processing_Level',
+    'nutritional_density': 'Nutritional_Density',
+    'glycemic_index': 'Glycemic_Index',
+    'additives_count': 'Additives_Count'
+}
+
+# Columns spanning the nutrient space used for similar-food lookups
+SIMILARITY_COLUMNS = FLOAT_COLUMNS + ['Glycemic_Index', 'Processing_Level', 'Nutritional_Density']
+
+# Response schema for filter results
+NUTRIENT_RESULT_FIELDS = {
+    'name': ('Food_Name', None),
+    'category': ('Food_Category', None),
+    **{name: (col, None) for name, col in NUTRIENT_FIELDS.items()}
+}
+
+# Query-string suffix -> (bound, inclusive)
+RANGE_OPERATORS = {
+    'min': ('low', True),
+    'gt': ('low', False),
+    'max': ('high', True),
+    'lt': ('high', False)
+}
+
+
+class FoodCatalog:
+    """Read-only, typed view of the food database with prebuilt search indexes"""
+
+    def __init__(self, df):
+        """
+        Build the catalog from a raw food database DataFrame.
+
+        Args:
+            df (pd.DataFrame): Food database as read from CSV
+        """
+        df = df.reset_index(drop=True)
+        df['Food_Name'] = df['Food_Name'].astype(object)
+        for col in FLOAT_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+        for col in INT_COLUMNS:
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors='coerce')
+                df[col] = values.astype(np.int64) if values.notna().all() else values.astype(np.float64)
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        self.df = df
+
+        self.names = df['Food_Name'].to_numpy()
+        self.names_lower = [normalize_name(name) for name in self.names]
+        self.columns = {
+            col: (df[col].cat.codes.to_numpy() if col in CATEGORICAL_COLUMNS else df[col].to_numpy())
+            for col in df.columns if col != 'Food_Name'
+        }
+
+        self.search_index = TrigramIndex(self.names)
+        self.health_scores = health_rank_scores(df)
+        self.prefix_index = PrefixIndex(self.names, df['Food_Category'], self.health_scores)
+        self.fuzzy_index = FuzzyIndex(self.names)
+        self.nutrient_index = NutrientIndex({
+            col: self.columns[col] for col in NUTRIENT_FIELDS.values() if col in self.columns
+        })
+        self.health_rankings = self._build_health_rankings()
+        similarity_columns = [col for col in SIMILARITY_COLUMNS if col in self.columns]
+        self.similarity_index = SimilarityIndex(
+            np.column_stack([self.columns[col] for col in similarity_columns]), self.health_scores
+        ) if similarity_columns else None
+
+    def _build_health_rankings(self):
+        """Row ids by Nutritional_Density (desc) then Processing_Level (asc), globally (None) and per category code"""
+        if 'Nutritional_Density' not in self.columns or 'Processing_Level' not in self.columns:
+            return {None: np.arange(len(self.df))}
+        # lexsort is stable and sorts by the last key first
+        order = np.lexsort((self.columns['Processing_Level'], -self.columns['Nutritional_Density']))
+        rankings = {None: order}
+        codes = self.columns['Food_Category'][order]
+        for code in range(len(self.df['Food_Category'].cat.categories)):
+            rankings[code] = order[codes == code]
+        return rankings
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_CATALOG_PATH, encodings=('utf-8', 'latin-1', 'cp1252')):
+        """Read a food database CSV, trying each encoding in turn"""
+        last_error = None
+        for encoding in encodings:
+            try:
+                df = pd.read_csv(path, encoding=encoding)
+                logger.info(f"Food catalog {path} loaded with {len(df)} entries using {encoding} encoding")
+                return cls(df)
+            except UnicodeDecodeError as e:
+                logger.warning(f"Failed to load {path} with {encoding}: {e}")
+                last_error = e
+        raise last_error
+
+    def __len__(self):
+        return len(self.df)
+
+    # ==================== LOOKUP ====================
+
+    def search(self, query, limit=None):
+        """Row ids whose name contains query (case-insensitive), in catalog order"""
+        return self.search_index.search(query, limit=limit)
+
+    def autocomplete(self, prefix, limit=10):
+        """Best-ranked row ids whose name or category has a word starting with prefix"""
+        return self.prefix_index.complete(prefix, limit=limit)
+
+    def lookup(self, name):
+        """Row id for a food name, tolerating small typos, or None"""
+        match = self.fuzzy_index.lookup(name)
+        return match[0] if match is not None else None
+
+    def similar(self, row_id, k=5, healthier=False):
+        """(row_id, distance) pairs for the k nearest rows in standardized nutrient space"""
+        if self.similarity_index is None:
+            return []
+        return self.similarity_index.neighbors(row_id, k=k, healthier=healthier)
+
+    # ==================== FILTERS ====================
+
+    def category_codes(self, category, exact=False):
+        """Codes of Food_Category values equal to (or containing) category, case-insensitive"""
+        needle = normalize_name(category)
+        return [
+            code for code, value in enumerate(self.df['Food_Category'].cat.categories)
+            if (normalize_name(value) == needle if exact else needle in normalize_name(value))
+        ]
+
+    def filter_category(self, row_ids, category, exact=False):
+        """Keep only the row ids whose Food_Category matches category"""
+        codes = self.category_codes(category, exact=exact)
+        if not codes:
+            return []
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        keep = np.isin(self.columns['Food_Category'][row_ids], codes)
+        return row_ids[keep].tolist()
+
+    def filter(self, ranges=None, category=None, sort_by=None, descending=False):
+        """
+        Row ids matching every range predicate and the category, optionally sorted.
+
+        Args:
+            ranges (list): (column, low, high, low_inclusive, high_inclusive) tuples
+            category (str): Exact Food_Category to keep (case-insensitive)
+            sort_by (str): Indexed column to order by (catalog order if None)
+            descending (bool): Sort from highest to lowest
+
+        Returns:
+            np.ndarray: Matching row ids
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for col, low, high, low_inclusive, high_inclusive in ranges or []:
+            mask &= self.nutrient_index.mask(col, low, high, low_inclusive, high_inclusive)
+        if category:
+            mask &= np.isin(self.columns['Food_Category'], self.category_codes(category, exact=True))
+        if sort_by:
+            return self.nutrient_index.ordered(sort_by, mask, descending=descending)
+        return np.flatnonzero(mask)
+
+    def top_healthy(self, category=None, limit=10):
+        """Row ids of the healthiest foods overall or within one category (case-insensitive), from the precomputed rankings"""
+        if category is None:
+            return self.health_rankings[None][:limit].tolist()
+        codes = self.category_codes(category, exact=True)
+        if len(codes) == 1 and codes[0] in self.health_rankings:
+            return self.health_rankings[codes[0]][:limit].tolist()
+        if not codes:
+            return []
+        # Several spellings normalize to the same name: filter the global ranking
+        ranking = self.health_rankings[None]
+        return ranking[np.isin(self.columns['Food_Category'][ranking], codes)][:limit].tolist()
+
+    def categories(self):
+        """Food categories in order of first appearance"""
+        return self.df['Food_Category'].unique().tolist()
+
+    # ==================== SERIALIZATION ====================
+
+    def rows(self, row_ids):
+        """DataFrame slice for the given row ids"""
+        return self.df.iloc[row_ids]
+
+    def column_values(self, col, row_ids):
+        """NumPy values of a column for the given row ids (category labels for categorical columns)"""
+        if col in CATEGORICAL_COLUMNS:
+            return self.df[col].cat.categories.to_numpy(dtype=object)[self.columns[col][row_ids]]
+        if col == 'Food_Name':
+            return self.names[row_ids]
+        return self.columns[col][row_ids]
+
+    def serialize(self, row_ids, fields, constants=None, id_key=None):
+        """
+        Build response records for the given row ids in one pass per column.
+
+        Args:
+            row_ids: Row ids to serialize, in output order
+            fields (dict): Output key -> (column, cast) where cast is int, float or None;
+                missing columns serialize as 0 (or None when cast is None), NaN as 0
+            constants (dict): Static fields merged into every record
+            id_key (str): If given, the row id is included under this key
+
+        Returns:
+            list: One dict per row with JSON-serializable values
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        keys = [id_key] if id_key else []
+        columns = [row_ids.tolist()] if id_key else []
+        for key, (col, cast) in fields.items():
+            keys.append(key)
+            if col not in self.df.columns:
+                columns.append([cast(0) if cast else None] * len(row_ids))
+                continue
+            values = self.column_values(col, row_ids)
+            if cast is not None:
+                values = np.nan_to_num(values.astype(np.float64))
+                if cast is int:
+                    values = values.astype(np.int64)
+            columns.append(values.tolist())
+        constants = constants or {}
+        return [{**dict(zip(keys, row)), **constants} for row in zip(*columns)]
+
+    def records(self, row_ids, columns=None):
+        """Plain-Python records for the given row ids, keyed by column name"""
+        columns = list(columns) if columns is not None else list(self.df.columns)
+        return self.serialize(row_ids, {col: (col, None) for col in columns})
+
+    def record(self, row_id, columns=None):
+        """Plain-Python record for a single row id"""
+        return self.records([row_id], columns)[0]
+
+
+_catalogs = {}
+
+
+def get_food_catalog(path=DEFAULT_CATALOG_PATH):
+    """Process-wide FoodCatalog for path, loaded on first use"""
+    if path not in _catalogs:
+        _catalogs[path] = FoodCatalog.from_csv(path)
+    return _catalogs[path]
+
+
+def parse_filter_args(args):
+    """
+    Translate query-string arguments into FoodCatalog.filter keyword arguments.
+
+    Range predicates are written as <nutrient>_<op>=<value>, e.g. protein_min=20 or
+    sugar_lt=5, with nutrients from NUTRIENT_FIELDS and ops from RANGE_OPERATORS.
+    Sorting uses sort=<nutrient> and order=asc|desc.
+
+    Args:
+        args: Mapping of query-string arguments (e.g. request.args)
+
+    Returns:
+        dict: Keyword arguments for FoodCatalog.filter
+
+    Raises:
+        ValueError: If a bound is not a number or the sort field is unknown
+    """
+    bounds = {}
+    for key, value in args.items():
+        name, _, op = key.rpartition('_')
+        if name not in NUTRIENT_FIELDS or op not in RANGE_OPERATORS:
+            continue
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid number for {key}: {value}")
+        bound, inclusive = RANGE_OPERATORS[op]
+        col_bounds = bounds.setdefault(NUTRIENT_FIELDS[name], {'low': None, 'high': None, 'low_inclusive': True, 'high_inclusive': True})
+        col_bounds[bound] = value
+        col_bounds[f"{bound}_inclusive"] = inclusive
+
+    sort = args.get('sort')
+    if sort and sort not in NUTRIENT_FIELDS:
+        raise ValueError(f"Unknown sort field: {sort}")
+
+    return {
+        'ranges': [
+            (col, b['low'], b['high'], b['low_inclusive'], b['high_inclusive'])
+            for col, b in bounds.items()
+        ],
+        'category': args.get('category') or None,
+        'sort_by': NUTRIENT_FIELDS[sort] if sort else None,
+        'descending': args.get('order', 'asc').lower() == 'desc'
+    }
@@ -0,0 +1,344 @@
+"""
+In-memory search indexes over the food catalog
+Built once when the food database is loaded so request handlers never scan the whole DataFrame
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+import numpy as np
+from sklearn.neighbors import KDTree
+
+
+def normalize_name(name):
+    """Lowercase and trim a food name, returning '' for missing values"""
+    if name is None or name != name:  # NaN check without importing pandas
+        return ""
+    return str(name).strip().lower()
+
+
+class TrigramIndex:
+    """Character trigram inverted index answering substring queries over food names"""
+
+    N = 3
+
+    def __init__(self, names):
+        """
+        Build the index from an iterable of food names.
+
+        Args:
+            names: Food names in row order; the position of each name is its row id
+        """
+        self.names = [normalize_name(name) for name in names]
+        self.valid = [i for i, name in enumerate(self.names) if name]
+        postings = defaultdict(set)
+        for row_id in self.valid:
+            for gram in self._grams(self.names[row_id]):
+                postings[gram].add(row_id)
+        self.postings = {gram: frozenset(ids) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def _grams(cls, text):
+        return {text[i:i + cls.N] for i in range(len(text) - cls.N + 1)}
+
+    def search(self, query, limit=None):
+        """
+        Return row ids whose name contains the query, in row order.
+
+        Args:
+            query (str): Case-insensitive substring to look for
+            limit (int): Maximum number of row ids to return (None for all)
+
+        Returns:
+            list: Matching row ids, ascending
+        """
+        query = str(query).lower()
+
+        if len(query) < self.N:
+            # Too short to have a trigram - scan the precomputed lowercase names
+            candidates = self.valid
+        else:
+            posting_lists = []
+            for gram in self._grams(query):
+                ids = self.postings.get(gram)
+                if not ids:
+                    return []
+                posting_lists.append(ids)
+            posting_lists.sort(key=len)
+            candidates = set(posting_lists[0])
+            for ids in posting_lists[1:]:
+                candidates &= ids
+                if not candidates:
+                    return []
+            candidates = sorted(candidates)
+
+        results = []
+        for row_id in candidates:
+            # Trigram hits are necessary but not sufficient for a substring match
+            if query in self.names[row_id]:
+                results.append(row_id)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+
+def health_rank_scores(food_db):
+    """Static per-row ranking score: nutrient-dense, minimally processed foods first"""
+    density = food_db['Nutritional_Density'].fillna(0).astype(float)
+    processing = food_db['Processing_Level'].fillna(10).astype(float)
+    return (density * 10 - processing).tolist()
+
+
+class PrefixIndex:
+    """Sorted-array prefix index for autocomplete over food names and categories"""
+
+    def __init__(self, names, categories=None, scores=None):
+        """
+        Build the index from food names and optional categories and ranking scores.
+
+        Every word-boundary suffix of a name or category becomes a key, so
+        "chicken sa" completes "Grilled chicken salad" as well as "Chicken salad".
+
+        Args:
+            names: Food names in row order; the position of each name is its row id
+            categories: Optional category per row, indexed alongside the name
+            scores: Optional ranking score per row (higher ranks first)
+        """
+        names = list(names)
+        categories = list(categories) if categories is not None else [None] * len(names)
+        self.scores = list(scores) if scores is not None else [0.0] * len(names)
+
+        entries = set()
+        for row_id, (name, category) in enumerate(zip(names, categories)):
+            for text in (normalize_name(name), normalize_name(category)):
+                words = text.split()
+                for i in range(len(words)):
+                    entries.add((" ".join(words[i:]), row_id))
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.row_ids = [row_id for _, row_id in entries]
+
+    def complete(self, prefix, limit=10):
+        """
+        Return the best-ranked row ids with a name or category token starting with prefix.
+
+        Args:
+            prefix (str): Case-insensitive prefix typed so far
+            limit (int): Maximum number of completions
+
+        Returns:
+            list: Row ids ordered by score (descending), then row order
+        """
+        prefix = " ".join(normalize_name(prefix).split())
+        if not prefix:
+            return []
+
+        start = bisect_left(self.keys, prefix)
+        matched = set()
+        for i in range(start, len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                break
+            matched.add(self.row_ids[i])
+
+        return heapq.nsmallest(limit, matched, key=lambda row_id: (-self.scores[row_id], row_id))
+
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    limit = max_distance + 1
+    # Only cells within max_distance of the diagonal can stay under the limit
+    previous = [j if j <= max_distance else limit for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [limit] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        for j in range(low, high + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != b[j - 1]),
+                limit
+            )
+        if min(current[low - 1:high + 1]) > max_distance:
+            return limit
+        previous = current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """SymSpell-style deletes dictionary resolving misspelled food names to catalog rows"""
+
+    def __init__(self, names, max_distance=2, prefix_length=7):
+        """
+        Build the index from an iterable of food names.
+
+        Only the first prefix_length characters of each name are expanded into
+        deletes; candidates are then verified against the full name.
+
+        Args:
+            names: Food names in row order; the position of each name is its row id
+            max_distance (int): Largest edit distance a lookup will accept
+            prefix_length (int): Characters of each name expanded into deletes
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.names = [normalize_name(name) for name in names]
+        self.exact = {}
+        deletes = defaultdict(set)
+        for row_id, name in enumerate(self.names):
+            if not name:
+                continue
+            self.exact.setdefault(name, row_id)
+            for key in self._deletes(name[:prefix_length]):
+                deletes[key].add(row_id)
+        self.deletes = {key: frozenset(ids) for key, ids in deletes.items()}
+
+    def _deletes(self, word):
+        """All strings reachable from word by removing up to max_distance characters"""
+        results = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            results |= frontier
+        return results
+
+    def lookup(self, name):
+        """
+        Resolve a possibly misspelled name to the closest catalog row.
+
+        Args:
+            name (str): Food name as typed or read by OCR
+
+        Returns:
+            tuple: (row_id, distance) of the closest match, or None if nothing is within max_distance
+        """
+        query = " ".join(normalize_name(name).split())
+        if not query:
+            return None
+        if query in self.exact:
+            return self.exact[query], 0
+
+        candidates = set()
+        for key in self._deletes(query[:self.prefix_length]):
+            candidates |= self.deletes.get(key, frozenset())
+
+        best = None
+        for row_id in sorted(candidates):
+            distance = edit_distance(query, self.names[row_id], self.max_distance)
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (row_id, distance)
+                if distance == 1:
+                    break
+        return best
+
+
+class NutrientIndex:
+    """Per-column sorted index arrays answering range predicates as boolean bitsets"""
+
+    def __init__(self, columns):
+        """
+        Build the index from numeric columns.
+
+        Args:
+            columns (dict): Column name -> NumPy array of values in row order
+        """
+        self.size = len(next(iter(columns.values()))) if columns else 0
+        self.order = {}
+        self.order_desc = {}
+        self.sorted_values = {}
+        for col, values in columns.items():
+            values = np.asarray(values, dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            valid = ~np.isnan(values[order])  # NaN sorts last and never matches a range
+            order = order[valid]
+            self.order[col] = order
+            self.sorted_values[col] = values[order]
+            # Descending by value, ties still in row order
+            self.order_desc[col] = order[np.lexsort((order, -values[order]))]
+
+    def __contains__(self, col):
+        return col in self.order
+
+    def mask(self, col, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        Bitset of rows whose value in col lies within [low, high].
+
+        Args:
+            col (str): Indexed column name
+            low (float): Lower bound (None for unbounded)
+            high (float): Upper bound (None for unbounded)
+            low_inclusive (bool): Whether low itself matches
+            high_inclusive (bool): Whether high itself matches
+
+        Returns:
+            np.ndarray: Boolean array with one entry per row
+        """
+        sorted_values = self.sorted_values[col]
+        start = 0 if low is None else np.searchsorted(
+            sorted_values, low, side='left' if low_inclusive else 'right')
+        end = len(sorted_values) if high is None else np.searchsorted(
+            sorted_values, high, side='right' if high_inclusive else 'left')
+        result = np.zeros(self.size, dtype=bool)
+        result[self.order[col][start:end]] = True
+        return result
+
+    def ordered(self, col, mask=None, descending=False):
+        """Row ids sorted by col (ties in row order), optionally restricted to a bitset"""
+        order = self.order_desc[col] if descending else self.order[col]
+        if mask is not None:
+            order = order[mask[order]]
+        return order
+
+
+class SimilarityIndex:
+    """KD-tree over standardized nutrient vectors for nearest-neighbour food lookups"""
+
+    def __init__(self, matrix, scores=None):
+        """
+        Build the tree from a feature matrix.
+
+        Args:
+            matrix (np.ndarray): One row of nutrient features per catalog row (NaN treated as the column mean)
+            scores: Optional ranking score per row, used to keep only healthier neighbours
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        self.mean = np.nanmean(matrix, axis=0)
+        self.std = np.nanstd(matrix, axis=0)
+        self.std[self.std == 0] = 1.0
+        matrix = np.where(np.isnan(matrix), self.mean, matrix)
+        self.vectors = (matrix - self.mean) / self.std
+        self.scores = np.asarray(scores, dtype=np.float64) if scores is not None else None
+        self.tree = KDTree(self.vectors)
+
+    def neighbors(self, row_id, k=5, healthier=False):
+        """
+        Nearest catalog rows to row_id, closest first.
+
+        Args:
+            row_id (int): Row to find neighbours for
+            k (int): Number of neighbours to return
+            healthier (bool): Only return rows that rank higher than row_id
+
+        Returns:
+            list: (row_id, distance) tuples
+        """
+        size = len(self.vectors)
+        query_k = min(size, k * 4 + 1 if healthier else k + 1)
+        while True:
+            distances, row_ids = self.tree.query(self.vectors[row_id:row_id + 1], k=query_k)
+            results = [
+                (int(other), float(distance))
+                for other, distance in zip(row_ids[0], distances[0])
+                if other != row_id and (not healthier or self.scores[other] > self.scores[row_id])
+            ]
+            if len(results) >= k or query_k == size:
+                return results[:k]
+            query_k = size
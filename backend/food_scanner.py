@@ -1,6 +1,7 @@
 import pandas as pd
 import pickle
-from sklearn.preprocessing import LabelEncoder
+from food_catalog import get_food_catalog
+from inference import FeatureVectorizer, format_prediction, load_category_lookups
 
 class FoodScanner:
     """Interactive Food Scanner for disease risk analysis"""
@@ -10,37 +11,41 @@ class FoodScanner:
         self.model = None
         self.label_encoder_y = None
         self.food_db = None
-        self.encoders = {}
+        self.catalog = None
+        self.vectorizer = None
         self.load_models()
         self.load_food_database()
 
     def load_models(self):
         """Load the trained food analysis model and encoders"""
         try:
-            self.model = pickle.load(open("models/xgboost_model.pkl", "rb"))
-            self.label_encoder_y = pickle.load(open("models/label_encoder_y.pkl", "rb"))
-            # Optionally load feature encoders if needed
+            self.model = pickle.load(open("models/food_analysis_model.pkl", "rb"))
+            self.label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
+            feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
+            label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
+            lookups = load_category_lookups("models/food_feature_lookups.pkl", label_encoders)
+            self.vectorizer = FeatureVectorizer(feature_cols, lookups)
         except Exception as e:
             print(f"❌ Error loading models: {e}")
             self.model = None
             self.label_encoder_y = None
+            self.vectorizer = None
 
     def load_food_database(self):
         """Load the food database"""
         try:
-            self.food_db = pd.read_csv("data/food_database.csv")
+            self.catalog = get_food_catalog("data/food_database.csv")
+            self.food_db = self.catalog.df
         except Exception as e:
             print(f"❌ Error loading food database: {e}")
             self.food_db = None
+            self.catalog = None
 
     def search_food(self, query):
         """Search for food items in the database"""
         if self.food_db is None:
             return pd.DataFrame()
-        query = query.lower()
-        matches = self.food_db[
-            self.food_db['Food_Name'].str.lower().str.contains(query, na=False)
-        ]
+        matches = self.catalog.rows(self.catalog.search(query, limit=10))
         return matches[['Food_Name', 'Food_Category', 'Calories_per_100g', 'Processing_Level', 'Nutritional_Density']].head(10)
 
     def analyze_food_item(self, food_name=None, nutritional_data=None):
@@ -48,39 +53,24 @@ class FoodScanner:
         if self.model is None or self.label_encoder_y is None:
             return {"error": "Model not loaded"}
 
-        # If food_name provided, get from database
+        # If food_name provided, get from database (closest name within a small edit distance)
         if food_name and self.food_db is not None:
-            row = self.food_db[self.food_db['Food_Name'].str.lower() == food_name.lower()]
-            if not row.empty:
-                nutritional_data = row.iloc[0].to_dict()
+            row_id = self.catalog.lookup(food_name)
+            if row_id is not None:
+                nutritional_data = self.catalog.record(row_id)
 
         # If nutritional_data is still None, return error
         if nutritional_data is None:
             return {"error": "No nutritional data provided"}
 
-        # Prepare DataFrame
-        df = pd.DataFrame([nutritional_data])
-
-        # Encode categorical features if needed
-        for col in df.select_dtypes(include=["object"]).columns:
-            if col in self.food_db.columns:
-                le = LabelEncoder()
-                le.fit(self.food_db[col].astype(str))
-                df[col] = le.transform(df[col].astype(str))
-
-        # Make prediction
+        # Make prediction (categories encoded through the persisted training lookups)
         try:
-            pred = self.model.predict(df)
-            probabilities = self.model.predict_proba(df)[0]
-            max_prob = max(probabilities)
-            predicted_disease = self.label_encoder_y.inverse_transform(pred)[0]
-            all_probs = dict(zip(self.label_encoder_y.classes_, probabilities))
+            probabilities = self.model.predict_proba(self.vectorizer.transform_one(nutritional_data))[0]
+            prediction = format_prediction(probabilities, [str(label) for label in self.label_encoder_y.classes_])
             analysis = self.get_nutritional_analysis(nutritional_data)
             return {
                 "food_name": food_name or nutritional_data.get("Food_Name", "Unknown"),
-                "predicted_disease": predicted_disease,
-                "confidence": max_prob,
-                "all_probabilities": all_probs,
+                **prediction,
                 "nutritional_analysis": analysis
             }
         except Exception as e:
@@ -157,17 +147,14 @@ class FoodScanner:
         """Get all available food categories"""
         if self.food_db is None:
             return []
-        return self.food_db['Food_Category'].unique().tolist()
+        return self.catalog.categories()
 
     def get_top_healthy_foods(self, category=None, limit=10):
         """Get top healthy foods from database"""
         if self.food_db is None:
             return pd.DataFrame()
-        df = self.food_db.copy()
-        if category:
-            df = df[df['Food_Category'] == category]
-        df = df.sort_values(['Nutritional_Density', 'Processing_Level'], ascending=[False, True])
-        return df[['Food_Name', 'Food_Category', 'Nutritional_Density', 'Processing_Level']].head(limit)
+        row_ids = self.catalog.top_healthy(category=category, limit=limit)
+        return self.catalog.rows(row_ids)[['Food_Name', 'Food_Category', 'Nutritional_Density', 'Processing_Level']]
 
 def main():
     """Interactive command-line interface for food scanning"""
@@ -201,7 +188,7 @@ def main():
                 print("❌ No results found")
         
         elif choice == "2":
-            food_name = input("🍎 Enter exact food name: ").strip()
+            food_name = input("🍎 Enter food name: ").strip()
             result = scanner.analyze_food_item(food_name=food_name)
             if "error" in result:
                 print(f"❌ {result['error']}")
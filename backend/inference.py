@@ -0,0 +1,806 @@
+"""
+Disease-risk inference helpers for the food label model
+Turns catalog rows into model features and precomputes predictions so
+name-based analysis requests never have to run the model
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import xgboost as xgb
+from tree_ensemble import CompiledEnsemble
+
+logger = logging.getLogger(__name__)
+
+
+def format_prediction(probabilities, classes):
+    """
+    Build the analyze_food response fields from one row of class probabilities.
+
+    Args:
+        probabilities: Class probabilities in label-encoder order
+        classes: Decoded class labels in label-encoder order
+
+    Returns:
+        dict: predicted_disease, confidence and all_probabilities as plain Python values
+    """
+    probabilities = [float(p) for p in probabilities]
+    best = int(np.argmax(probabilities))
+    return {
+        "predicted_disease": classes[best],
+        "confidence": probabilities[best],
+        "all_probabilities": dict(zip(classes, probabilities))
+    }
+
+
+def build_category_lookups(label_encoders, frame):
+    """
+    Dict-based replacements for fitted LabelEncoders, persisted by train_model.py.
+
+    Each lookup maps the string form of a training category to its LabelEncoder
+    code and names an explicit bucket for categories never seen in training: the
+    code of the column's most frequent training value.
+
+    Args:
+        label_encoders (dict): Column -> fitted LabelEncoder
+        frame (pd.DataFrame): Training data the encoders were fitted on
+
+    Returns:
+        dict: Column -> {"codes": {label: code}, "unknown": code}
+    """
+    lookups = {}
+    for col, encoder in label_encoders.items():
+        codes = {str(label): code for code, label in enumerate(encoder.classes_)}
+        lookups[col] = {"codes": codes, "unknown": codes[frame[col].astype(str).mode()[0]]}
+    return lookups
+
+
+def build_feature_defaults(frame, feature_cols):
+    """
+    Fallback value per feature for requests that omit it, persisted by train_model.py.
+
+    Categorical columns default to their most frequent value and numeric columns
+    to their mean, as plain Python values.
+    """
+    defaults = {}
+    for col in feature_cols:
+        if frame[col].dtype == 'object':
+            defaults[col] = str(frame[col].mode()[0])
+        else:
+            defaults[col] = float(frame[col].mean())
+    return defaults
+
+
+def load_category_lookups(path, label_encoders=None):
+    """
+    Load persisted category lookups, or derive them from fitted LabelEncoders.
+
+    Lookups derived from encoders have no unknown bucket, so unseen categories
+    are rejected exactly as LabelEncoder.transform would reject them.
+    """
+    if os.path.exists(path) or label_encoders is None:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    return {
+        col: {"codes": {str(label): code for code, label in enumerate(encoder.classes_)}, "unknown": None}
+        for col, encoder in label_encoders.items()
+    }
+
+
+def encode_category(lookup, value):
+    """Code for one categorical value, falling back to the lookup's unknown bucket"""
+    code = lookup["codes"].get(str(value))
+    if code is None:
+        code = lookup["unknown"]
+        if code is None:
+            raise ValueError(f"Unknown category: {value}")
+    return code
+
+
+def encode_catalog_features(catalog, category_lookups, feature_cols):
+    """
+    Feature matrix for every catalog row, encoding categorical columns once per category.
+
+    Args:
+        catalog (FoodCatalog): Catalog to encode
+        category_lookups (dict): Column -> lookup from build_category_lookups
+        feature_cols (list): Model feature order
+
+    Returns:
+        np.ndarray: float32 matrix with one row per catalog row
+    """
+    X = np.empty((len(catalog), len(feature_cols)), dtype=np.float32)
+    for j, col in enumerate(feature_cols):
+        series = catalog.df[col]
+        if col in category_lookups:
+            lookup = category_lookups[col]
+            if hasattr(series, 'cat'):
+                # Encode each distinct category once, then broadcast through the codes
+                encoded = np.array([encode_category(lookup, value) for value in series.cat.categories])
+                X[:, j] = encoded[series.cat.codes.to_numpy()]
+            else:
+                X[:, j] = [encode_category(lookup, value) for value in series]
+        else:
+            X[:, j] = series.to_numpy(dtype=np.float32)
+    return X
+
+
+class FeatureVectorizer:
+    """Maps request dicts straight into float32 model rows in feature order, without pandas"""
+
+    def __init__(self, feature_cols, category_lookups):
+        """
+        Args:
+            feature_cols (list): Model feature order
+            category_lookups (dict): Column -> lookup from build_category_lookups / load_category_lookups
+        """
+        self.feature_cols = list(feature_cols)
+        self.lookups = {col: lookup for col, lookup in category_lookups.items() if col in self.feature_cols}
+        self._columns = [(j, col, self.lookups.get(col)) for j, col in enumerate(self.feature_cols)]
+        self._local = threading.local()
+
+    def _fill(self, out, data):
+        for j, col, lookup in self._columns:
+            if col not in data:
+                raise ValueError(f"Missing feature: {col}")
+            value = data[col]
+            if lookup is not None and isinstance(value, str):
+                try:
+                    out[j] = encode_category(lookup, value)
+                except ValueError:
+                    raise ValueError(f"Unknown value for {col}: {value}")
+            else:
+                try:
+                    out[j] = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid number for {col}: {value}")
+        return out
+
+    def transform_one(self, data):
+        """
+        Encode one request dict into this thread's preallocated (1, n_features) row.
+
+        The returned array is reused by the next call on the same thread.
+
+        Raises:
+            ValueError: If a feature is missing, non-numeric or an unknown category
+        """
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.feature_cols)), dtype=np.float32)
+        self._fill(row[0], data)
+        return row
+
+    def transform(self, records):
+        """Encode a list of request dicts into a new (len(records), n_features) matrix"""
+        X = np.empty((len(records), len(self.feature_cols)), dtype=np.float32)
+        for i, data in enumerate(records):
+            self._fill(X[i], data)
+        return X
+
+    def transform_each(self, records):
+        """
+        Encode a list of request dicts, collecting per-record errors instead of raising.
+
+        Returns:
+            tuple: (matrix with one row per valid record in input order,
+                    list with None for valid records and an error message otherwise)
+        """
+        X = np.empty((len(records), len(self.feature_cols)), dtype=np.float32)
+        errors = []
+        valid = 0
+        for data in records:
+            try:
+                if not isinstance(data, dict):
+                    raise ValueError("nutritional_data must be an object")
+                self._fill(X[valid], data)
+            except ValueError as e:
+                errors.append(str(e))
+                continue
+            errors.append(None)
+            valid += 1
+        return X[:valid], errors
+
+
+class CatalogPredictions:
+    """Disease-risk predictions for every catalog row, scored with one batched predict_proba call"""
+
+    def __init__(self, catalog, model, classes, category_lookups, feature_cols):
+        """
+        Score the whole catalog.
+
+        Args:
+            catalog (FoodCatalog): Catalog whose rows are scored
+            model: Fitted classifier exposing predict_proba
+            classes (list): Decoded class labels in label-encoder order
+            category_lookups (dict): Column -> category lookup
+            feature_cols (list): Model feature order
+        """
+        X = encode_catalog_features(catalog, category_lookups, feature_cols)
+        probabilities = model.predict_proba(X)
+        self.results = [format_prediction(row, classes) for row in probabilities]
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, row_id):
+        """Precomputed prediction fields for a catalog row"""
+        return self.results[row_id]
+
+
+class _PendingRow:
+    """One queued predict_proba request waiting for its batch"""
+
+    __slots__ = ('row', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predict_proba calls into one batched model call"""
+
+    def __init__(self, predict_proba, window_ms=0.0, max_batch_size=32):
+        """
+        Args:
+            predict_proba: Callable taking an (n, n_features) matrix and returning (n, n_classes) probabilities
+            window_ms (float): How long the first queued row waits for others; 0 disables batching
+            max_batch_size (int): Largest batch sent to the model in one call
+        """
+        self.predict_fn = predict_proba
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._queue = []
+        self._condition = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "rows": 0,
+            "max_batch_size_seen": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0
+        }
+
+    @classmethod
+    def from_env(cls, predict_proba):
+        """Build a batcher configured by INFERENCE_BATCH_WINDOW_MS and INFERENCE_MAX_BATCH_SIZE"""
+        return cls(
+            predict_proba,
+            window_ms=float(os.getenv('INFERENCE_BATCH_WINDOW_MS', 0)),
+            max_batch_size=int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 32))
+        )
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def predict_proba(self, row):
+        """
+        Class probabilities for a single (1, n_features) row.
+
+        Blocks until the batch containing the row has been scored; with batching
+        disabled, or once the batcher is closed, the model is called directly.
+        """
+        if not self.enabled:
+            return self._predict_direct(row)
+
+        pending = _PendingRow(np.asarray(row, dtype=np.float32).reshape(-1))
+        with self._condition:
+            # A closed batcher's worker may be exiting and would never score the row
+            # (e.g. a request still holding a model the registry just replaced)
+            if self._closed:
+                pending = None
+            else:
+                self._ensure_worker()
+                self._queue.append(pending)
+                self._condition.notify()
+        if pending is None:
+            return self._predict_direct(row)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _predict_direct(self, row):
+        probabilities = self.predict_fn(row)[0]
+        self._record([0.0])
+        return probabilities
+
+    def _ensure_worker(self):
+        # Forked workers (e.g. gunicorn) do not inherit the parent's thread
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                # Hold the batch open until the window closes or it fills up
+                deadline = self._queue[0].enqueued + self.window
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._queue[:self.max_batch_size]
+                del self._queue[:self.max_batch_size]
+
+            started = time.perf_counter()
+            try:
+                probabilities = self.predict_fn(np.vstack([pending.row for pending in batch]))
+                for pending, result in zip(batch, probabilities):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+            self._record([(started - pending.enqueued) * 1000.0 for pending in batch])
+
+    def close(self):
+        """Let the worker thread exit once the queued rows have been scored; later rows bypass the queue"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _record(self, waits_ms):
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(waits_ms)
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(waits_ms))
+            self._stats["queue_wait_ms_total"] += sum(waits_ms)
+            self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], max(waits_ms))
+
+    def metrics(self):
+        """Batch-size and queue-wait counters since startup"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        rows = stats["rows"]
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": batches,
+            "rows": rows,
+            "mean_batch_size": rows / batches if batches else 0.0,
+            "max_batch_size_seen": stats["max_batch_size_seen"],
+            "mean_queue_wait_ms": stats["queue_wait_ms_total"] / rows if rows else 0.0,
+            "max_queue_wait_ms": stats["queue_wait_ms_max"]
+        }
+
+
+class PredictionCache:
+    """LRU cache of formatted predictions keyed by the encoded (optionally quantized) feature row"""
+
+    def __init__(self, feature_cols, max_size=1024, ttl=300.0, rounding=None):
+        """
+        Args:
+            feature_cols (list): Model feature order
+            max_size (int): Most entries kept; the least recently used is evicted first
+            ttl (float): Seconds an entry stays valid (0 for no expiry)
+            rounding (dict): Feature -> decimals to round to before keying (negative rounds to tens, hundreds...)
+        """
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self.rounding = [
+            (j, rounding[col]) for j, col in enumerate(feature_cols) if rounding and col in rounding
+        ]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @classmethod
+    def from_env(cls, feature_cols):
+        """
+        Cache configured by PREDICTION_CACHE_SIZE (0 disables), PREDICTION_CACHE_TTL
+        and PREDICTION_CACHE_ROUNDING, e.g. "Ages:0,Calories:-1,Sugar_per_100g:1".
+
+        Returns:
+            PredictionCache or None when disabled
+        """
+        max_size = int(os.getenv('PREDICTION_CACHE_SIZE', 1024))
+        if max_size <= 0:
+            return None
+        rounding = {}
+        for item in filter(None, os.getenv('PREDICTION_CACHE_ROUNDING', '').split(',')):
+            col, _, decimals = item.rpartition(':')
+            rounding[col.strip()] = int(decimals)
+        return cls(feature_cols, max_size=max_size, ttl=float(os.getenv('PREDICTION_CACHE_TTL', 300)), rounding=rounding)
+
+    def quantize(self, row):
+        """Round the configured features of an encoded (1, n_features) row in place"""
+        for j, decimals in self.rounding:
+            row[0, j] = np.round(row[0, j], decimals)
+        return row
+
+    def key(self, row):
+        return row.tobytes()
+
+    def get(self, key):
+        """Cached prediction for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires, value = entry
+            if self.ttl and expires < time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def metrics(self):
+        """Hit ratio and eviction counters since this cache (i.e. this model version) was created"""
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "rounded_features": len(self.rounding),
+            **stats,
+            "hit_ratio": stats["hits"] / lookups if lookups else 0.0
+        }
+
+
+class RiskModel:
+    """A loaded disease-risk classifier with everything needed to serve it"""
+
+    def __init__(self, model, classes, vectorizer, defaults=None, catalog=None):
+        """
+        Args:
+            model: Fitted classifier, NativeBooster, CompiledEnsemble or OnnxModel exposing predict_proba
+            classes (list): Decoded class labels in label-encoder order
+            vectorizer (FeatureVectorizer): Request encoder in model feature order
+            defaults (dict): Optional per-feature fallback values for omitted features
+            catalog (FoodCatalog): Optional catalog whose rows are scored up front
+        """
+        self.model = model
+        self.classes = [str(label) for label in classes]
+        self.vectorizer = vectorizer
+        self.feature_cols = vectorizer.feature_cols
+        self.defaults = defaults or {}
+        # Coalesces concurrent single-row predictions (INFERENCE_BATCH_WINDOW_MS > 0 enables it)
+        self.batcher = MicroBatcher.from_env(model.predict_proba)
+        # Belongs to this bundle, so a model reload starts from an empty cache
+        self.cache = PredictionCache.from_env(self.feature_cols)
+        self.catalog_predictions = CatalogPredictions(
+            catalog, model, self.classes, vectorizer.lookups, vectorizer.feature_cols
+        ) if catalog is not None else None
+
+    def with_defaults(self, data):
+        """Request features in model order, with omitted ones taken from the defaults"""
+        return {col: data[col] if col in data else self.defaults[col] for col in self.feature_cols}
+
+    def predict_one(self, data):
+        """
+        Prediction fields for a single request dict.
+
+        With a prediction cache, configured features are rounded before both the
+        cache lookup and the model call, so hits and misses agree.
+
+        Raises:
+            ValueError: If a feature is missing, non-numeric or an unknown category
+        """
+        row = self.vectorizer.transform_one(data)
+        if self.cache is None:
+            return format_prediction(self.batcher.predict_proba(row), self.classes)
+        key = self.cache.key(self.cache.quantize(row))
+        prediction = self.cache.get(key)
+        if prediction is None:
+            prediction = format_prediction(self.batcher.predict_proba(row), self.classes)
+            self.cache.put(key, prediction)
+        return prediction
+
+    def predict_proba(self, X):
+        """Class probabilities for an already-encoded matrix"""
+        return self.model.predict_proba(X)
+
+    def close(self):
+        self.batcher.close()
+
+
+class NativeBooster:
+    """predict_proba over a bare XGBoost Booster loaded from its native UBJ/JSON format"""
+
+    def __init__(self, model_path):
+        self.booster = xgb.Booster()
+        self.booster.load_model(model_path)
+
+    def predict_proba(self, X):
+        # Inputs are already in training feature order; skip the name check on plain arrays
+        probabilities = self.booster.inplace_predict(np.asarray(X, dtype=np.float32), validate_features=False)
+        if probabilities.ndim == 1:
+            probabilities = np.column_stack([1.0 - probabilities, probabilities])
+        return probabilities
+
+
+class OnnxModel:
+    """predict_proba through an ONNX Runtime session over a model written by export_onnx_model"""
+
+    def __init__(self, model_path):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("INFERENCE_ENGINE=onnx requires onnxruntime (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        # Requests already run on many threads; keep each call on one core by default
+        options.intra_op_num_threads = int(os.getenv('ONNX_INTRA_OP_THREADS', 1))
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.session.run(["probabilities"], {self.input_name: X})[0]
+
+
+def export_onnx_model(booster, path):
+    """
+    Convert an XGBoost booster to ONNX (requires onnxmltools).
+
+    The graph takes a float32 "input" matrix in training feature order and
+    returns "label" and "probabilities" outputs.
+    """
+    from onnxmltools import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    booster = booster.copy()
+    # The converter only understands positional f0..fN feature names
+    booster.feature_names = None
+    n_features = booster.num_features()
+    onnx_model = convert_xgboost(booster, initial_types=[("input", FloatTensorType([None, n_features]))])
+    with open(path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+
+def booster_of(model):
+    """The xgboost.Booster behind a pickled XGBClassifier or a NativeBooster"""
+    return model.booster if isinstance(model, NativeBooster) else model.get_booster()
+
+
+def select_engine(model, onnx_path=None):
+    """
+    The predictor to serve for a loaded model, chosen by INFERENCE_ENGINE.
+
+    "xgboost" (default) keeps the model as loaded; "numpy" compiles its trees
+    into a CompiledEnsemble, which is faster for single-row requests; "onnx"
+    serves the exported ONNX graph through ONNX Runtime.
+    """
+    engine = os.getenv('INFERENCE_ENGINE', 'xgboost').lower()
+    if engine == 'numpy':
+        return CompiledEnsemble.from_booster(booster_of(model))
+    if engine == 'onnx':
+        if onnx_path is None or not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"INFERENCE_ENGINE=onnx but {onnx_path} has not been exported")
+        return OnnxModel(onnx_path)
+    if engine != 'xgboost':
+        raise ValueError(f"Unknown INFERENCE_ENGINE: {engine}")
+    return model
+
+
+def native_category_lookups(categories, booster):
+    """
+    Category lookups for a booster trained with native categorical features.
+
+    A feature value is the position of its category in the training categories
+    written to the metadata by train_model.py. Unseen categories become NaN,
+    which XGBoost routes like a missing value.
+
+    Args:
+        categories (dict): Column -> list of training categories
+        booster (xgb.Booster): Booster whose 'c' features need a lookup
+
+    Raises:
+        ValueError: If a categorical feature of the booster has no categories
+    """
+    lookups = {
+        name: {"codes": {str(category): code for code, category in enumerate(values)}, "unknown": float("nan")}
+        for name, values in categories.items()
+    }
+    categorical = [name for name, kind in zip(booster.feature_names or [], booster.feature_types or []) if kind == "c"]
+    missing = [name for name in categorical if name not in lookups]
+    if not categorical or missing:
+        # Without lookups every string category would be rejected as an invalid number
+        raise ValueError(
+            "Native categorical model metadata has no categories for: "
+            f"{missing or 'any feature (the booster has no categorical features)'}"
+        )
+    return lookups
+
+
+def export_native_model(model, classes, feature_cols, category_lookups, model_path, meta_path,
+                        defaults=None, categories=None):
+    """
+    Write a fitted XGBClassifier as a native booster file plus a JSON metadata file.
+
+    The metadata holds everything else needed to serve the model (class labels,
+    feature order, category lookups and optional defaults), so loading needs
+    neither pickle nor scikit-learn. Models trained with native categorical
+    support get their training categories (column -> list) instead of lookups.
+    """
+    model.get_booster().save_model(model_path)
+    metadata = {
+        "format_version": 1,
+        "xgboost_version": xgb.__version__,
+        "classes": [str(label) for label in classes],
+        "feature_names": list(feature_cols),
+        "native_categorical": categories is not None,
+        "category_lookups": {} if categories is not None else category_lookups,
+        "categories": categories or {},
+        "defaults": defaults or {}
+    }
+    with open(meta_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_native_risk_model(model_path, meta_path, catalog=None, onnx_path=None):
+    """RiskModel built from the files written by export_native_model"""
+    with open(meta_path) as f:
+        metadata = json.load(f)
+    model = NativeBooster(model_path)
+    if metadata.get("native_categorical"):
+        lookups = native_category_lookups(metadata["categories"], model.booster)
+    else:
+        lookups = metadata["category_lookups"]
+    vectorizer = FeatureVectorizer(metadata["feature_names"], lookups)
+    return RiskModel(
+        select_engine(model, onnx_path), metadata["classes"], vectorizer,
+        defaults=metadata["defaults"], catalog=catalog
+    )
+
+
+def _model_format():
+    """
+    Which artifacts to serve, from MODEL_FORMAT: "native" (default, falls back to
+    the pickles when not exported or, unless set explicitly, when they fail to
+    load), "pickle", or "categorical" for the models trained with native
+    categorical support.
+    """
+    return os.getenv('MODEL_FORMAT', 'native').lower()
+
+
+def _native_available(model_path, meta_path):
+    """Whether to serve from native artifacts (MODEL_FORMAT=pickle forces the pickled wrappers)"""
+    if _model_format() != 'native':
+        return False
+    return os.path.exists(model_path) and os.path.exists(meta_path)
+
+
+USER_NATIVE_MODEL = "models/user_model.ubj"
+USER_NATIVE_META = "models/user_model_meta.json"
+FOOD_NATIVE_MODEL = "models/food_model.ubj"
+FOOD_NATIVE_META = "models/food_model_meta.json"
+USER_ONNX_MODEL = "models/user_model.onnx"
+FOOD_ONNX_MODEL = "models/food_model.onnx"
+USER_CATEGORICAL_MODEL = "models/user_model_categorical.ubj"
+USER_CATEGORICAL_META = "models/user_model_categorical_meta.json"
+FOOD_CATEGORICAL_MODEL = "models/food_model_categorical.ubj"
+FOOD_CATEGORICAL_META = "models/food_model_categorical_meta.json"
+
+USER_PICKLE_FILES = [
+    "models/xgboost_model.pkl",
+    "models/label_encoder_y.pkl",
+    "models/user_feature_names.pkl",
+    "models/user_feature_lookups.pkl",
+    "models/user_feature_defaults.pkl"
+]
+
+FOOD_PICKLE_FILES = [
+    "models/food_analysis_model.pkl",
+    "models/food_label_encoder_y.pkl",
+    "models/food_feature_names.pkl",
+    "models/food_feature_encoders.pkl",
+    "models/food_feature_lookups.pkl"
+]
+
+USER_MODEL_FILES = [
+    USER_ONNX_MODEL, USER_NATIVE_MODEL, USER_NATIVE_META,
+    USER_CATEGORICAL_MODEL, USER_CATEGORICAL_META, *USER_PICKLE_FILES
+]
+
+FOOD_MODEL_FILES = [
+    FOOD_ONNX_MODEL, FOOD_NATIVE_MODEL, FOOD_NATIVE_META,
+    FOOD_CATEGORICAL_MODEL, FOOD_CATEGORICAL_META, *FOOD_PICKLE_FILES
+]
+
+
+def _load_native_with_fallback(name, load_native, load_pickle):
+    """
+    Serve native artifacts, falling back to the pickles when loading them fails
+    (e.g. a .ubj written by a newer XGBoost), unless MODEL_FORMAT=native was set explicitly.
+    """
+    try:
+        return load_native()
+    except Exception as e:
+        if os.getenv('MODEL_FORMAT', '').lower() == 'native':
+            raise
+        logger.error(f"❌ Loading native {name} model failed, falling back to the pickles: {e}")
+        return load_pickle()
+
+
+def _load_user_pickle_model():
+    model_path, target_path, names_path, lookups_path, defaults_path = USER_PICKLE_FILES
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    with open(target_path, "rb") as f:
+        label_encoder_y = pickle.load(f)
+    with open(names_path, "rb") as f:
+        feature_cols = pickle.load(f)
+    with open(defaults_path, "rb") as f:
+        defaults = pickle.load(f)
+    vectorizer = FeatureVectorizer(feature_cols, load_category_lookups(lookups_path))
+    return RiskModel(select_engine(model, USER_ONNX_MODEL), label_encoder_y.classes_, vectorizer, defaults=defaults)
+
+
+def _load_food_pickle_model(catalog=None):
+    model_path, target_path, names_path, encoders_path, lookups_path = FOOD_PICKLE_FILES
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    with open(target_path, "rb") as f:
+        label_encoder_y = pickle.load(f)
+    with open(names_path, "rb") as f:
+        feature_cols = pickle.load(f)
+    with open(encoders_path, "rb") as f:
+        label_encoders = pickle.load(f)
+    vectorizer = FeatureVectorizer(feature_cols, load_category_lookups(lookups_path, label_encoders))
+    return RiskModel(select_engine(model, FOOD_ONNX_MODEL), label_encoder_y.classes_, vectorizer, catalog=catalog)
+
+
+def load_user_risk_model():
+    """User nutrition model, from native artifacts when exported, else from the pickles written by train_user_model"""
+    if _model_format() == 'categorical':
+        return load_native_risk_model(USER_CATEGORICAL_MODEL, USER_CATEGORICAL_META)
+    if _native_available(USER_NATIVE_MODEL, USER_NATIVE_META):
+        return _load_native_with_fallback(
+            "user",
+            lambda: load_native_risk_model(USER_NATIVE_MODEL, USER_NATIVE_META, onnx_path=USER_ONNX_MODEL),
+            _load_user_pickle_model
+        )
+    return _load_user_pickle_model()
+
+
+def load_food_risk_model(catalog=None):
+    """Food label model, from native artifacts when exported, else from the pickles written by train_food_model"""
+    if _model_format() == 'categorical':
+        return load_native_risk_model(FOOD_CATEGORICAL_MODEL, FOOD_CATEGORICAL_META, catalog=catalog)
+    if _native_available(FOOD_NATIVE_MODEL, FOOD_NATIVE_META):
+        return _load_native_with_fallback(
+            "food",
+            lambda: load_native_risk_model(FOOD_NATIVE_MODEL, FOOD_NATIVE_META, catalog=catalog, onnx_path=FOOD_ONNX_MODEL),
+            lambda: _load_food_pickle_model(catalog)
+        )
+    return _load_food_pickle_model(catalog)
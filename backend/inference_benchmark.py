@@ -0,0 +1,110 @@
+"""
+Parity and latency check for the inference engines
+Compares the stock XGBoost predictor against the pure-NumPy evaluator and,
+when exported and installed, the ONNX Runtime backend on both models
+
+Usage:
+    python inference_benchmark.py
+
+Exits with status 1 if any engine fails its parity check
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from food_catalog import get_food_catalog
+from inference import (
+    OnnxModel, booster_of, encode_catalog_features, load_food_risk_model, load_user_risk_model,
+    USER_ONNX_MODEL, FOOD_ONNX_MODEL
+)
+from tree_ensemble import CompiledEnsemble
+
+
+def check_parity(reference, candidate, X, atol=1e-5):
+    """
+    Compare two predictors on the same rows.
+
+    Returns:
+        dict: Largest absolute probability difference, argmax agreement and whether it is within atol
+    """
+    expected = reference.predict_proba(X)
+    actual = candidate.predict_proba(X)
+    max_diff = float(np.abs(expected - actual).max())
+    return {
+        "rows": len(X),
+        "max_abs_diff": max_diff,
+        "argmax_agreement": float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1))),
+        "passed": max_diff <= atol
+    }
+
+
+def benchmark(predict_proba, X, repeats=200):
+    """p50/p99 latency in milliseconds of single-row predict_proba calls over the rows of X"""
+    timings = []
+    for i in range(repeats):
+        row = X[i % len(X):i % len(X) + 1]
+        started = time.perf_counter()
+        predict_proba(row)
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return {"p50_ms": float(np.percentile(timings, 50)), "p99_ms": float(np.percentile(timings, 99))}
+
+
+def engines_for(model, onnx_path):
+    """Every engine that can be built for a loaded model in this environment"""
+    engines = {"xgboost": model, "numpy": CompiledEnsemble.from_booster(booster_of(model))}
+    if os.path.exists(onnx_path):
+        try:
+            engines["onnx"] = OnnxModel(onnx_path)
+        except ImportError as e:
+            print(f"⚠️ Skipping ONNX: {e}")
+    return engines
+
+
+def main():
+    """
+    Returns:
+        int: 0 if every engine matched the stock predictor, 1 otherwise
+    """
+    # Load with the stock engine so it can serve as the reference
+    os.environ['INFERENCE_ENGINE'] = 'xgboost'
+    user_model = load_user_risk_model()
+    user_df = pd.read_csv("data/custom_nutrition_dataset.csv")
+    X_user = user_model.vectorizer.transform(user_df[user_model.feature_cols].to_dict("records"))
+    food_model = load_food_risk_model()
+    catalog = get_food_catalog("data/food_database_fixed.csv")
+    X_food = encode_catalog_features(catalog, food_model.vectorizer.lookups, food_model.feature_cols)
+
+    failures = []
+    for name, risk_model, X, onnx_path in [
+        ("user", user_model, X_user, USER_ONNX_MODEL),
+        ("food", food_model, X_food, FOOD_ONNX_MODEL)
+    ]:
+        print(f"\n🌲 {name} model on {len(X)} rows")
+        engines = engines_for(risk_model.model, onnx_path)
+        reference = engines["xgboost"]
+        for engine, predictor in engines.items():
+            if predictor is not reference:
+                parity = check_parity(reference, predictor, X)
+                if not parity["passed"]:
+                    failures.append(f"{name}/{engine}")
+                print(f"{'✅' if parity['passed'] else '❌'} {engine} parity: max |diff| {parity['max_abs_diff']:.2e}, "
+                      f"argmax agreement {parity['argmax_agreement']:.2%}")
+        for engine, predictor in engines.items():
+            single = benchmark(predictor.predict_proba, X)
+            started = time.perf_counter()
+            predictor.predict_proba(X)
+            batch_ms = (time.perf_counter() - started) * 1000.0
+            print(f"⏱️  {engine:<8} single-row p50 {single['p50_ms']:.3f} ms, p99 {single['p99_ms']:.3f} ms, "
+                  f"full batch {batch_ms:.1f} ms")
+
+    if failures:
+        print(f"\n❌ Parity failed for: {', '.join(failures)}")
+        return 1
+    print("\n✅ All engines match the stock predictor")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
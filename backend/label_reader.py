@@ -5,6 +5,24 @@ from PIL import Image
 import re
 import json
 import os
+import time
+from ocr_engine import ParallelOcr, SharedImage, create_ocr_engine
+
+# OCR passes in cascade order: (image source, tesseract config)
+OCR_PASSES = [
+    ("original", r'--oem 3 --psm 3'),      # Direct OCR, auto page segmentation
+    ("preprocessed", r'--oem 3 --psm 6'),  # Uniform text block
+    ("preprocessed", r'--oem 3 --psm 3'),  # Auto page segmentation
+    ("preprocessed", r'--oem 3 --psm 1'),  # Auto with OSD
+    ("preprocessed", r'--oem 3 --psm 11'), # Sparse text
+    ("preprocessed", r'--oem 3 --psm 12'), # Sparse text with OSD
+]
+
+# Words whose presence shows the OCR pass actually read a nutrition panel
+NUTRITION_KEYWORDS = [
+    'nutrition', 'serving', 'calories', 'energy', 'protein', 'fat', 'saturated',
+    'carbohydrate', 'sugar', 'fiber', 'fibre', 'sodium', 'salt', 'cholesterol'
+]
 
 class FoodLabelReader:
     """OCR-based food label reader for extracting nutritional information"""
@@ -28,7 +46,29 @@ class FoodLabelReader:
         else:
             print("Warning: Tesseract not found at common paths. OCR may not work.")
             print("Please install Tesseract-OCR or add it to your PATH.")
+
+        # Persistent tesserocr handles when available (OCR_BACKEND, OCR_POOL_SIZE), else pytesseract
+        self.ocr = create_ocr_engine()
+        print(f"OCR backend: {self.ocr.name}")
+        if getattr(self.ocr, "fallback_reason", None):
+            print(f"⚠️ Persistent tesserocr handles unavailable, forking tesseract per OCR pass: {self.ocr.fallback_reason}")
+
+        # The OCR cascade stops at the first pass scoring at least this (0-1)
+        self.ocr_score_threshold = float(os.getenv('OCR_SCORE_THRESHOLD', 0.7))
+        # Distinct nutrition keywords that earn a pass the full keyword score
+        self.ocr_keyword_target = int(os.getenv('OCR_KEYWORD_TARGET', 5))
+        # Opt-in: OCR_PARALLEL_WORKERS > 0 runs all cascade passes at once in worker processes
+        self.parallel_ocr = ParallelOcr.from_env()
+        if self.parallel_ocr:
+            print(f"Parallel OCR enabled with {self.parallel_ocr.workers} worker processes")
     
+    def ocr_info(self):
+        """OCR backend stats plus the parallel worker pool's, for /health"""
+        return {
+            **self.ocr.info(),
+            "parallel": self.parallel_ocr.info() if self.parallel_ocr else None
+        }
+
     def preprocess_image(self, image_path):
         """Preprocess image for better OCR results"""
         try:
@@ -65,49 +105,124 @@ class FoodLabelReader:
                 print(f"Fallback preprocessing also failed: {fallback_error}")
                 raise
     
+    def score_ocr_pass(self, text, confidences):
+        """
+        Quality of one OCR pass: half mean word confidence, half nutrition keyword coverage.
+
+        Returns:
+            dict: score (0-1), mean_confidence (0-100) and keywords found
+        """
+        text_lower = text.lower()
+        keywords = sum(1 for keyword in NUTRITION_KEYWORDS if keyword in text_lower)
+        mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        keyword_score = min(keywords / self.ocr_keyword_target, 1.0) if self.ocr_keyword_target > 0 else 1.0
+        return {
+            "score": round(0.5 * mean_confidence / 100.0 + 0.5 * keyword_score, 4),
+            "mean_confidence": round(mean_confidence, 2),
+            "keywords": keywords
+        }
+    
+    def _scored_pass(self, source, config, text, confidences, ms):
+        text = text.strip()
+        return {"source": source, "config": config, **self.score_ocr_pass(text, confidences),
+                "chars": len(text), "ms": round(ms, 2)}, text
+    
+    def run_ocr_cascade(self, image_path):
+        """
+        Run OCR_PASSES in order, stopping at the first pass that reaches the score threshold.
+
+        The image is only preprocessed once a pass needs it. Without an early exit
+        the best-scoring pass wins. With parallel OCR enabled, every pass runs at
+        once in the worker pool instead.
+
+        Returns:
+            dict: text, winning source/config/score, early_exit, total_ms and per-pass
+                  source, config, score, mean_confidence, keywords, chars and ms
+        """
+        started = time.perf_counter()
+        if self.parallel_ocr:
+            best, passes, extra = self._run_parallel_passes(image_path)
+        else:
+            best, passes, extra = self._run_serial_passes(image_path)
+        
+        winner, text = best if best else ({}, "")
+        report = {
+            "text": text,
+            "source": winner.get("source"),
+            "config": winner.get("config"),
+            "score": winner.get("score", 0.0),
+            "early_exit": winner.get("score", 0.0) >= self.ocr_score_threshold,
+            "threshold": self.ocr_score_threshold,
+            "total_ms": round((time.perf_counter() - started) * 1000.0, 2),
+            "passes": passes,
+            **extra
+        }
+        print(f"OCR winner: {report['source']} {report['config']} (score {report['score']}) "
+              f"after {len(passes)} pass(es) in {report['total_ms']} ms")
+        return report
+    
+    def _run_serial_passes(self, image_path):
+        images = {"original": image_path}
+        passes = []
+        best = None
+        for source, config in OCR_PASSES:
+            pass_started = time.perf_counter()
+            try:
+                if source not in images:
+                    images[source] = self.preprocess_image(image_path)
+                text, confidences = self.ocr.image_to_data(images[source], config=config)
+            except Exception as pass_error:
+                print(f"OCR pass {source} {config} failed: {pass_error}")
+                passes.append({"source": source, "config": config, "error": str(pass_error),
+                               "ms": round((time.perf_counter() - pass_started) * 1000.0, 2)})
+                continue
+            result, text = self._scored_pass(source, config, text, confidences,
+                                             (time.perf_counter() - pass_started) * 1000.0)
+            passes.append(result)
+            if text and (best is None or result["score"] > best[0]["score"]):
+                best = (result, text)
+            if text and result["score"] >= self.ocr_score_threshold:
+                break
+        return best, passes, {"parallel": False}
+    
+    def _run_parallel_passes(self, image_path):
+        """
+        Run passes at once on the idle workers, sharing the preprocessed image via shared memory.
+
+        Passes are handed out in OCR_PASSES order as workers free up. The first pass
+        reaching the threshold wins: passes not yet started are cancelled and workers
+        still running one are killed and replaced. Otherwise every pass runs and the
+        best (earliest on ties) wins.
+        """
+        passes = []
+        best = None
+        with SharedImage(self.preprocess_image(image_path)) as shared:
+            with self.parallel_ocr.batch([
+                ((order, source, config), image_path if source == "original" else shared, config)
+                for order, (source, config) in enumerate(OCR_PASSES)
+            ]) as batch:
+                for (order, source, config), status, payload in batch:
+                    if status != "ok":
+                        print(f"OCR pass {source} {config} failed: {payload}")
+                        passes.append({"source": source, "config": config, "error": payload})
+                        continue
+                    text, confidences, ms = payload
+                    result, text = self._scored_pass(source, config, text, confidences, ms)
+                    passes.append(result)
+                    if text and (best is None or (result["score"], -order) > (best[0]["score"], -best[2])):
+                        best = (result, text, order)
+                    if text and result["score"] >= self.ocr_score_threshold:
+                        break
+        return (best[:2] if best else None), passes, {
+            "parallel": True,
+            "cancelled": [config for _, _, config in batch.cancelled],
+            "killed": [config for _, _, config in batch.killed]
+        }
+    
     def extract_text_from_image(self, image_path):
         """Extract all text from food label image"""
         try:
-            # First, try direct text extraction without preprocessing
-            try:
-                # Direct OCR on original image
-                text_direct = pytesseract.image_to_string(Image.open(image_path), config=r'--oem 3 --psm 3')
-                if text_direct.strip():
-                    print("Direct OCR successful")
-                    return text_direct.strip()
-            except Exception as direct_error:
-                print(f"Direct OCR failed: {direct_error}")
-            
-            # If direct OCR fails, try preprocessed image
-            processed_img = self.preprocess_image(image_path)
-            
-            # Try multiple OCR configurations
-            ocr_configs = [
-                r'--oem 3 --psm 6',  # Uniform text block
-                r'--oem 3 --psm 3',  # Auto page segmentation
-                r'--oem 3 --psm 1',  # Auto with OSD
-                r'--oem 3 --psm 11', # Sparse text
-                r'--oem 3 --psm 12', # Single word
-            ]
-            
-            best_text = ""
-            for config in ocr_configs:
-                try:
-                    text = pytesseract.image_to_string(processed_img, config=config)
-                    if len(text.strip()) > len(best_text):
-                        best_text = text.strip()
-                        print(f"Better OCR result with config: {config}")
-                except Exception as config_error:
-                    print(f"OCR config {config} failed: {config_error}")
-                    continue
-            
-            if best_text:
-                return best_text
-            else:
-                # Last resort: try with original image and default config
-                text = pytesseract.image_to_string(Image.open(image_path))
-                return text.strip()
-                
+            return self.run_ocr_cascade(image_path)["text"]
         except Exception as e:
             print(f"Error extracting text: {e}")
             return ""
@@ -277,7 +392,8 @@ class FoodLabelReader:
             
             # Extract text from image
             print(f"Processing image: {image_path}")
-            text = self.extract_text_from_image(image_path)
+            ocr_report = self.run_ocr_cascade(image_path)
+            text = ocr_report.pop("text")
             
             if not text or len(text.strip()) < 3:
                 return {
@@ -329,7 +445,8 @@ class FoodLabelReader:
                 "processing_level": processing_level,
                 "nutritional_density": nutritional_density,
                 "analysis_complete": True,
-                "ocr_confidence": "medium"  # Could be calculated based on text quality
+                "ocr_confidence": self.ocr_confidence_label(ocr_report["score"]),
+                "ocr": ocr_report
             }
             
         except Exception as e:
@@ -346,6 +463,14 @@ class FoodLabelReader:
                 ]
             }
     
+    def ocr_confidence_label(self, score):
+        """high/medium/low for a winning OCR cascade score"""
+        if score >= self.ocr_score_threshold:
+            return "high"
+        elif score >= self.ocr_score_threshold / 2:
+            return "medium"
+        return "low"
+    
     def calculate_per_100g(self, nutritional_data):
         """Calculate nutritional values per 100g"""
         per_100g = {}
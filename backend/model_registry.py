@@ -0,0 +1,182 @@
+"""
+Hot-reloadable model registry
+Loads each model once per process, watches its artifact files and swaps in a
+freshly loaded version from a background thread without blocking requests,
+once the files have stopped changing
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(paths):
+    """Short version string derived from the mtime and size of each artifact file"""
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        except OSError:
+            digest.update(f"{path}:missing;".encode())
+    return digest.hexdigest()[:12]
+
+
+class _RegisteredModel:
+    """Current bundle for one registered name plus its reload bookkeeping"""
+
+    def __init__(self, name, loader, paths):
+        self.name = name
+        self.loader = loader
+        self.paths = list(paths)
+        self.bundle = None
+        self.version = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+        self.failed_version = None
+        # Fingerprint seen on the previous poll but not loaded yet
+        self.pending_version = None
+
+
+class ModelRegistry:
+    """Named model bundles, reloaded and atomically swapped when their files change"""
+
+    def __init__(self, poll_interval=10.0):
+        """
+        Args:
+            poll_interval (float): Seconds between artifact checks; 0 disables hot reload
+        """
+        self.poll_interval = poll_interval
+        self._models = {}
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a registry polling every MODEL_RELOAD_INTERVAL seconds (default 10, 0 disables)"""
+        return cls(poll_interval=float(os.getenv('MODEL_RELOAD_INTERVAL', 10)))
+
+    def register(self, name, loader, paths):
+        """
+        Load a model bundle now and keep watching its files.
+
+        Args:
+            name (str): Registry key
+            loader: Zero-argument callable returning the loaded bundle
+            paths (list): Artifact files whose changes trigger a reload
+
+        Returns:
+            The loaded bundle
+
+        Raises:
+            Exception: Whatever the loader raises on the initial load
+        """
+        entry = _RegisteredModel(name, loader, paths)
+        self._load(entry)
+        self._models[name] = entry
+        self._ensure_watcher()
+        return entry.bundle
+
+    def get(self, name):
+        """
+        Current bundle for name, or None if it was never loaded.
+
+        Callers should fetch the bundle once per request and use that reference
+        throughout, so a concurrent swap cannot mix two versions.
+        """
+        entry = self._models.get(name)
+        if entry is None:
+            return None
+        self._ensure_watcher()
+        return entry.bundle
+
+    def version(self, name):
+        """Version string of the bundle currently served under name"""
+        entry = self._models.get(name)
+        return entry.version if entry else None
+
+    def reload(self, name, force=False):
+        """
+        Reload name if its files changed (or unconditionally with force).
+
+        A changed fingerprint is only loaded once it is seen unchanged on two
+        consecutive calls, so a trainer still writing its 5-8 artifact files is
+        never caught with a new booster next to old metadata.
+
+        Returns:
+            bool: True if a new bundle was swapped in
+        """
+        entry = self._models[name]
+        with self._reload_lock:
+            version = file_fingerprint(entry.paths)
+            if not force:
+                if version in (entry.version, entry.failed_version):
+                    entry.pending_version = None
+                    return False
+                if version != entry.pending_version:
+                    # Still changing (or first seen): wait for the next poll to confirm it settled
+                    entry.pending_version = version
+                    return False
+            entry.pending_version = None
+            try:
+                self._load(entry)
+            except Exception as e:
+                # Keep serving the previous bundle until the files change again
+                entry.failed_version = version
+                entry.last_error = str(e)
+                logger.error(f"❌ Reloading model '{name}' failed, keeping version {entry.version}: {e}")
+                return False
+            entry.reloads += 1
+            logger.info(f"✅ Model '{name}' reloaded as version {entry.version}")
+            return True
+
+    def _load(self, entry):
+        version = file_fingerprint(entry.paths)
+        bundle = entry.loader()
+        previous = entry.bundle
+        # A single reference assignment: requests see either the old or the new bundle
+        entry.bundle = bundle
+        entry.version = version
+        entry.loaded_at = datetime.now().isoformat()
+        entry.last_error = None
+        entry.failed_version = None
+        if previous is not None and hasattr(previous, 'close'):
+            previous.close()
+
+    def _ensure_watcher(self):
+        if self.poll_interval <= 0:
+            return
+        # Forked workers (e.g. gunicorn) do not inherit the parent's thread
+        if self._watcher is None or self._watcher_pid != os.getpid() or not self._watcher.is_alive():
+            self._watcher_pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        stop = threading.Event()
+        while not stop.wait(self.poll_interval):
+            for name in list(self._models):
+                try:
+                    self.reload(name)
+                except Exception as e:
+                    logger.error(f"❌ Model watcher error for '{name}': {e}")
+
+    def info(self):
+        """Loaded version, load time and reload counters for every registered model"""
+        return {
+            name: {
+                "version": entry.version,
+                "loaded_at": entry.loaded_at,
+                "reloads": entry.reloads,
+                "last_error": entry.last_error,
+                "pending_version": entry.pending_version,
+                "hot_reload": self.poll_interval > 0
+            }
+            for name, entry in self._models.items()
+        }
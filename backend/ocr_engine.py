@@ -0,0 +1,574 @@
+"""
+OCR backends for the label reader
+Keeps a bounded pool of persistent Tesseract API handles (tesserocr) so each
+OCR pass reuses an already loaded language model instead of forking the
+tesseract binary, with pytesseract as the subprocess fallback, and an opt-in
+process pool that runs several passes over one image in parallel
+"""
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import re
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import reduction, resource_tracker, shared_memory
+import numpy as np
+import pytesseract
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_PSM_PATTERN = re.compile(r'--psm\s+(\d+)')
+
+
+def parse_psm(config, default=3):
+    """Page segmentation mode from a pytesseract config string such as '--oem 3 --psm 6'"""
+    match = _PSM_PATTERN.search(config or "")
+    return int(match.group(1)) if match else default
+
+
+def as_pil_image(image):
+    """PIL image from a path, a NumPy array (e.g. a preprocessed OpenCV image) or a PIL image"""
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    return Image.open(image)
+
+
+def data_to_text(data):
+    """Text of a pytesseract image_to_data dict, one line per Tesseract text line"""
+    lines = {}
+    for word, block, par, line in zip(data["text"], data["block_num"], data["par_num"], data["line_num"]):
+        if word.strip():
+            lines.setdefault((block, par, line), []).append(word)
+    return "\n".join(" ".join(words) for words in lines.values())
+
+
+class SubprocessTesseract:
+    """pytesseract backend: one tesseract process per call"""
+
+    name = "pytesseract"
+
+    def __init__(self, fallback_reason=None):
+        """
+        Args:
+            fallback_reason (str): Why the tesserocr pool is not in use, when it was wanted
+        """
+        self.fallback_reason = fallback_reason
+
+    def image_to_string(self, image, config=r'--oem 3 --psm 3'):
+        """Recognized text for an image path, array or PIL image"""
+        return pytesseract.image_to_string(as_pil_image(image), config=config)
+
+    def image_to_data(self, image, config=r'--oem 3 --psm 3'):
+        """
+        Recognized text and per-word confidences from a single OCR pass.
+
+        Returns:
+            tuple: (text, list of word confidences in 0-100)
+        """
+        data = pytesseract.image_to_data(as_pil_image(image), config=config, output_type=pytesseract.Output.DICT)
+        confidences = [float(conf) for word, conf in zip(data["text"], data["conf"]) if word.strip() and float(conf) >= 0]
+        return data_to_text(data), confidences
+
+    def close(self):
+        pass
+
+    def info(self):
+        return {"backend": self.name, "fallback_reason": self.fallback_reason}
+
+
+class TesseractPool:
+    """Bounded pool of persistent tesserocr API handles shared across requests"""
+
+    name = "tesserocr"
+
+    def __init__(self, size=None, lang="eng", tessdata_path=None):
+        """
+        Args:
+            size (int): Maximum number of handles, i.e. concurrent OCR passes (default: CPU count)
+            lang (str): Tesseract language(s), e.g. 'eng' or 'eng+fra'
+            tessdata_path (str): Directory holding the traineddata files (default: tesserocr's own)
+
+        Raises:
+            ImportError: If tesserocr is not installed
+        """
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise ImportError(f"tesserocr could not be imported ({e}); pip install -r requirements-ocr.txt")
+        self._tesserocr = tesserocr
+        self.size = max(1, int(size or os.cpu_count() or 1))
+        self.lang = lang
+        self.tessdata_path = tessdata_path
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._waits = 0
+        self._calls = 0
+
+    @classmethod
+    def from_env(cls):
+        """Pool configured by OCR_POOL_SIZE, OCR_LANG and TESSDATA_PREFIX"""
+        return cls(
+            size=int(os.getenv('OCR_POOL_SIZE', 0)) or None,
+            lang=os.getenv('OCR_LANG', 'eng'),
+            tessdata_path=os.getenv('TESSDATA_PREFIX')
+        )
+
+    def _create_handle(self):
+        kwargs = {"lang": self.lang, "oem": self._tesserocr.OEM.DEFAULT}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        return self._tesserocr.PyTessBaseAPI(**kwargs)
+
+    @contextmanager
+    def acquire(self):
+        """
+        Borrow a handle for one OCR pass, creating it lazily up to size.
+
+        Blocks while every handle is busy; a handle is never used by two threads at once.
+        """
+        with self._lock:
+            if self._idle.empty() and self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+                if self._idle.empty():
+                    self._waits += 1
+        try:
+            handle = self._create_handle() if create else self._idle.get()
+        except Exception:
+            if create:
+                with self._lock:
+                    self._created -= 1
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._calls += 1
+        try:
+            yield handle
+        finally:
+            # Drop the image and recognition results but keep the loaded model
+            handle.Clear()
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(handle)
+
+    def image_to_string(self, image, config=r'--oem 3 --psm 3'):
+        """Recognized text for an image path, array or PIL image; only --psm is read from config"""
+        pil_image = as_pil_image(image)
+        with self.acquire() as api:
+            api.SetPageSegMode(parse_psm(config))
+            api.SetImage(pil_image)
+            return api.GetUTF8Text()
+
+    def image_to_data(self, image, config=r'--oem 3 --psm 3'):
+        """
+        Recognized text and per-word confidences from a single OCR pass.
+
+        Returns:
+            tuple: (text, list of word confidences in 0-100)
+        """
+        pil_image = as_pil_image(image)
+        with self.acquire() as api:
+            api.SetPageSegMode(parse_psm(config))
+            api.SetImage(pil_image)
+            api.Recognize()
+            confidences = [float(conf) for word, conf in api.MapWordConfidences() if word.strip()]
+            return api.GetUTF8Text(), confidences
+
+    def close(self):
+        """End every idle handle and free its language model"""
+        while True:
+            try:
+                handle = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            handle.End()
+            with self._lock:
+                self._created -= 1
+
+    def info(self):
+        """Pool size and usage counters"""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "lang": self.lang,
+                "pool_size": self.size,
+                "handles_created": self._created,
+                "in_use": self._in_use,
+                "calls": self._calls,
+                "waits": self._waits
+            }
+
+
+def create_ocr_engine():
+    """
+    OCR backend selected by OCR_BACKEND: 'auto' (default) uses the tesserocr pool
+    when tesserocr is installed and pytesseract otherwise; 'tesserocr' and
+    'pytesseract' force one.
+
+    Raises:
+        ImportError: If OCR_BACKEND=tesserocr and tesserocr is not installed
+    """
+    backend = os.getenv('OCR_BACKEND', 'auto').lower()
+    if backend == 'pytesseract':
+        return SubprocessTesseract()
+    try:
+        return TesseractPool.from_env()
+    except ImportError as e:
+        if backend == 'tesserocr':
+            raise
+        reason = f"OCR_BACKEND={backend}: {e}"
+        # Every OCR pass will fork tesseract; surface it in the logs and on /health
+        logger.warning(f"⚠️ tesserocr unavailable, OCR falls back to one tesseract process per pass: {reason}")
+        return SubprocessTesseract(fallback_reason=reason)
+
+
+class SharedImage:
+    """A NumPy image copied once into shared memory so worker processes can read it without pickling"""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(self.shape, dtype=array.dtype, buffer=self._shm.buf)[...] = array
+
+    @property
+    def ref(self):
+        """Picklable (name, shape, dtype) reference a worker attaches to"""
+        return (self._shm.name, self.shape, self.dtype)
+
+    def close(self):
+        """Release and unlink the block; workers already attached keep their mapping"""
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_worker_engine = None
+
+
+def _init_ocr_worker():
+    global _worker_engine
+    # One persistent handle per worker process; the process pool is the concurrency bound
+    os.environ['OCR_POOL_SIZE'] = '1'
+    _worker_engine = create_ocr_engine()
+    if isinstance(_worker_engine, TesseractPool):
+        # Load the language model now so every forked worker inherits it ready to use
+        with _worker_engine.acquire():
+            pass
+
+
+def _ocr_worker_pass(image, config):
+    """Run one OCR pass in a worker on a path or a SharedImage.ref; returns (text, confidences, ms)"""
+    started = time.perf_counter()
+    if isinstance(image, tuple):
+        name, shape, dtype = image
+        # Attaching registers the name with the resource tracker shared with the serving
+        # process, which already tracks it and unregisters it when it unlinks the block
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            image = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+    text, confidences = _worker_engine.image_to_data(image, config=config)
+    return text, confidences, (time.perf_counter() - started) * 1000.0
+
+
+def _ocr_worker_loop(conn):
+    """Worker loop: one (image, config) pass per message until the pipe closes or None arrives"""
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        try:
+            conn.send(("ok", _ocr_worker_pass(*message)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+def _ocr_nursery_main(conn):
+    """
+    Load the OCR engine once, then fork a ready worker for every spawn request.
+
+    The nursery never runs OCR itself, so it stays single-threaded and is always
+    safe to fork from, unlike the serving process.
+    """
+    _init_ocr_worker()
+    # Killed workers are reaped by the kernel
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    conn.send("ready")
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        parent_conn, child_conn = multiprocessing.Pipe()
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            conn.close()
+            parent_conn.close()
+            try:
+                _ocr_worker_loop(child_conn)
+            finally:
+                os._exit(0)
+        child_conn.close()
+        conn.send(pid)
+        reduction.send_handle(conn, parent_conn.fileno(), None)
+        parent_conn.close()
+
+
+class _OcrWorker:
+    """A worker process and the serving process's end of its pipe"""
+
+    def __init__(self, pid, conn):
+        self.pid = pid
+        self.conn = conn
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.conn.close()
+
+
+class ParallelBatch:
+    """
+    OCR passes for one image, dispatched only to idle workers and yielded as they complete.
+
+    Use as a context manager and iterate to get (key, status, payload) with
+    status 'ok' (payload is (text, confidences, ms)) or 'error'. On leaving,
+    passes never dispatched are cancelled and workers still running a pass are
+    killed and replaced, so nothing keeps running after the winner is known.
+    """
+
+    def __init__(self, pool, jobs):
+        self.pool = pool
+        self.pending = list(jobs)
+        self.running = {}
+        self.cancelled = []
+        self.killed = []
+
+    def _dispatch(self):
+        while self.pending:
+            # Wait for a worker only when nothing of ours is running, otherwise take idle ones
+            worker = self.pool._checkout(block=not self.running)
+            if worker is None:
+                return
+            key, image, config = self.pending.pop(0)
+            if isinstance(image, SharedImage):
+                image = image.ref
+            worker.conn.send((image, config))
+            self.running[worker.conn] = (worker, key)
+
+    def __iter__(self):
+        while self.pending or self.running:
+            self._dispatch()
+            for conn in multiprocessing.connection.wait(list(self.running)):
+                worker, key = self.running.pop(conn)
+                try:
+                    status, payload = conn.recv()
+                except (EOFError, OSError) as e:
+                    self.pool._replace(worker)
+                    yield key, "error", f"OCR worker died: {e}"
+                    continue
+                self.pool._release(worker)
+                yield key, status, payload
+
+    def close(self):
+        """Cancel passes not yet dispatched and kill (and replace) workers still running one"""
+        self.cancelled = [key for key, _, _ in self.pending]
+        self.pending = []
+        self.killed = [key for _, key in self.running.values()]
+        for worker, _ in self.running.values():
+            self.pool._replace(worker)
+        self.running = {}
+        self.pool._record_batch(len(self.cancelled), len(self.killed))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParallelOcr:
+    """Fixed-size set of OCR worker processes evaluating several configs for one image at the same time"""
+
+    def __init__(self, workers, ready_timeout=60.0):
+        """
+        Start the worker nursery and the workers.
+
+        Must run before the process starts any other thread (model watchers,
+        micro-batchers, request threads), since it forks. Later workers, including
+        replacements for killed ones, are forked by the single-threaded nursery,
+        never by the serving process.
+
+        Args:
+            workers (int): Worker processes, each holding one persistent OCR engine
+            ready_timeout (float): Seconds to wait for the nursery to load the OCR engine
+
+        Raises:
+            RuntimeError: If the platform cannot fork, pass pipes between processes or
+                SIGKILL workers (e.g. Windows), other threads are already running,
+                or the nursery fails to start
+        """
+        if not self.supported():
+            raise RuntimeError(
+                f"ParallelOcr needs os.fork, fd passing and SIGKILL, which {sys.platform} lacks; "
+                "unset OCR_PARALLEL_WORKERS to run OCR passes serially"
+            )
+        if threading.active_count() > 1:
+            raise RuntimeError(
+                "ParallelOcr must be created before any other thread starts; "
+                f"found {[t.name for t in threading.enumerate()]}"
+            )
+        self.workers = workers
+        self._pid = os.getpid()
+        self._condition = threading.Condition()
+        self._spawn_lock = threading.Lock()
+        self.respawns = 0
+        self.batches = 0
+        self.cancelled = 0
+        self.killed = 0
+        # Shared by every worker, so their shared-memory bookkeeping has one owner
+        resource_tracker.ensure_running()
+        self._nursery_conn, child_conn = multiprocessing.Pipe()
+        self._nursery = multiprocessing.get_context("fork").Process(
+            target=_ocr_nursery_main, args=(child_conn,), name="ocr-nursery", daemon=True
+        )
+        self._nursery.start()
+        child_conn.close()
+        if not self._nursery_conn.poll(ready_timeout) or self._nursery_conn.recv() != "ready":
+            self._nursery.terminate()
+            raise RuntimeError(f"OCR worker nursery did not start within {ready_timeout}s")
+        self._idle = [self._spawn() for _ in range(workers)]
+
+    @staticmethod
+    def supported():
+        """Whether this platform has what the nursery and workers rely on: fork, fd passing and SIGKILL"""
+        return (
+            "fork" in multiprocessing.get_all_start_methods()
+            and reduction.HAVE_SEND_HANDLE
+            and hasattr(signal, "SIGKILL")
+        )
+
+    @classmethod
+    def from_env(cls):
+        """
+        Pool of OCR_PARALLEL_WORKERS processes (default 0).
+
+        Returns:
+            ParallelOcr or None when disabled or unsupported on this platform,
+            in which case the cascade runs its passes serially
+        """
+        workers = int(os.getenv('OCR_PARALLEL_WORKERS', 0))
+        if workers <= 0:
+            return None
+        if not cls.supported():
+            logger.warning(f"⚠️ OCR_PARALLEL_WORKERS={workers} ignored: parallel OCR is not supported on {sys.platform}")
+            return None
+        return cls(workers)
+
+    def _spawn(self):
+        with self._spawn_lock:
+            try:
+                self._nursery_conn.send("spawn")
+                pid = self._nursery_conn.recv()
+                fd = reduction.recv_handle(self._nursery_conn)
+            except (EOFError, OSError) as e:
+                raise RuntimeError(f"OCR worker nursery is gone: {e}")
+        return _OcrWorker(pid, multiprocessing.connection.Connection(fd))
+
+    def batch(self, jobs):
+        """
+        Args:
+            jobs (list): (key, image, config) tuples in priority order; image is a path or SharedImage
+
+        Returns:
+            ParallelBatch to use as a context manager and iterate over
+
+        Raises:
+            RuntimeError: In a forked child (e.g. gunicorn --preload): the workers belong to the parent
+        """
+        if os.getpid() != self._pid:
+            raise RuntimeError("ParallelOcr was created in another process; create it after forking the server workers")
+        return ParallelBatch(self, jobs)
+
+    def _checkout(self, block):
+        with self._condition:
+            while not self._idle:
+                if not block:
+                    return None
+                self._condition.wait()
+            return self._idle.pop()
+
+    def _release(self, worker):
+        with self._condition:
+            self._idle.append(worker)
+            self._condition.notify()
+
+    def _replace(self, worker):
+        """Kill a busy or dead worker and put a fresh one from the nursery in its place"""
+        worker.kill()
+        replacement = self._spawn()
+        with self._condition:
+            self.respawns += 1
+            self._idle.append(replacement)
+            self._condition.notify()
+
+    def _record_batch(self, cancelled, killed):
+        with self._condition:
+            self.batches += 1
+            self.cancelled += cancelled
+            self.killed += killed
+
+    def close(self):
+        """Stop the nursery and every idle worker"""
+        with self._condition:
+            for worker in self._idle:
+                worker.kill()
+            self._idle = []
+        try:
+            self._nursery_conn.send(None)
+        except OSError:
+            pass
+        self._nursery.join(timeout=1)
+        if self._nursery.is_alive():
+            self._nursery.terminate()
+
+    def info(self):
+        """Worker count and batch, cancel and respawn counters"""
+        with self._condition:
+            return {
+                "parallel_workers": self.workers,
+                "idle": len(self._idle),
+                "batches": self.batches,
+                "passes_cancelled": self.cancelled,
+                "passes_killed": self.killed,
+                "respawns": self.respawns
+            }
@@ -5,10 +5,7 @@ Connects backend machine learning models with frontend Next.js application
 
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-import pickle
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
 import os
 import logging
 from datetime import datetime
@@ -21,6 +18,9 @@ import json
 # Import custom modules
 from food_scanner import FoodScanner
 from label_reader import FoodLabelReader
+from food_catalog import get_food_catalog, parse_filter_args, NUTRIENT_RESULT_FIELDS
+from inference import USER_MODEL_FILES, load_user_risk_model
+from model_registry import ModelRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,58 +30,43 @@ app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])  # Allow Next.js frontend
 
 # Global variables for models and data
-model = None
-label_encoder_y = None
+# Reloads models in the background when their files change (MODEL_RELOAD_INTERVAL seconds, 0 disables)
+model_registry = ModelRegistry.from_env()
 food_db = None
+food_catalog = None
 food_scanner = None
 label_reader = None
 
 def load_models_and_data():
     """Load all required models and datasets"""
-    global model, label_encoder_y, food_db, food_scanner, label_reader
+    global food_db, food_catalog, food_scanner, label_reader
     
     try:
         logger.info("Loading models and data...")
         
-        # Load main ML model
-        model = pickle.load(open("models/xgboost_model.pkl", "rb"))
-        label_encoder_y = pickle.load(open("models/label_encoder_y.pkl", "rb"))
-        logger.info("✅ XGBoost model loaded successfully")
+        # Initialize label reader first: parallel OCR forks its workers before any other thread starts
+        if label_reader is None:
+            label_reader = FoodLabelReader()
+            logger.info("✅ Label reader initialized")
+        
+        # Load main ML model with its training-time encoders and per-feature defaults
+        model_registry.register("user", load_user_risk_model, USER_MODEL_FILES)
+        logger.info(f"✅ XGBoost model loaded successfully (version {model_registry.version('user')})")
         
         # Load food database
-        food_db = pd.read_csv("data/food_database.csv", encoding='utf-8', errors='ignore')
+        food_catalog = get_food_catalog("data/food_database.csv")
+        food_db = food_catalog.df
         logger.info(f"✅ Food database loaded with {len(food_db)} entries")
         
-        # Initialize food scanner
+        # Initialize food scanner (shares the catalog loaded above)
         food_scanner = FoodScanner()
         logger.info("✅ Food scanner initialized")
         
-        # Initialize label reader
-        label_reader = FoodLabelReader()
-        logger.info("✅ Label reader initialized")
-        
         return True
     except Exception as e:
         logger.error(f"❌ Error loading models: {e}")
         return False
 
-def encode_categorical_features(test_df, original_df):
-    """Encode categorical features using the same encoding as training"""
-    encoded_df = test_df.copy()
-    categorical_cols = encoded_df.select_dtypes(include=["object"]).columns
-    
-    for col in categorical_cols:
-        if col in original_df.columns:
-            le = LabelEncoder()
-            le.fit(original_df[col].astype(str))
-            try:
-                encoded_df[col] = le.transform(encoded_df[col].astype(str))
-            except ValueError:
-                # Handle unknown categories by using the most frequent category
-                encoded_df[col] = le.transform([original_df[col].mode()[0]] * len(encoded_df))
-    
-    return encoded_df
-
 # Initialize models on startup
 def initialize():
     """Initialize the application"""
@@ -96,11 +81,16 @@ initialize()
 @app.route("/api/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
+    user_model = model_registry.get("user")
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "models_loaded": model is not None,
-        "food_db_loaded": food_db is not None
+        "models_loaded": user_model is not None,
+        "food_db_loaded": food_db is not None,
+        "models": model_registry.info(),
+        "inference_batching": user_model.batcher.metrics() if user_model else None,
+        "prediction_cache": user_model.cache.metrics() if user_model and user_model.cache else None,
+        "ocr": label_reader.ocr_info() if label_reader else None
     })
 
 # ==================== DASHBOARD ENDPOINTS ====================
@@ -154,23 +144,17 @@ def search_food():
         if food_db is None:
             return jsonify({"error": "Food database not loaded"}), 500
         
-        # Search in food database
-        query_lower = query.lower()
-        matches = food_db[
-            food_db['Food_Name'].str.lower().str.contains(query_lower, na=False)
-        ]
+        # Search in food database via the trigram index
+        row_ids = food_catalog.search(query, limit=20)
         
         # Format results
-        results = []
-        for _, row in matches.head(20).iterrows():
-            results.append({
-                "id": int(row.name),
-                "name": row['Food_Name'],
-                "category": row.get('Food_Category', 'Unknown'),
-                "calories_per_100g": row.get('Calories_per_100g', 0),
-                "processing_level": row.get('Processing_Level', 'Unknown'),
-                "nutritional_density": row.get('Nutritional_Density', 'Unknown')
-            })
+        results = food_catalog.serialize(row_ids, {
+            "name": ('Food_Name', None),
+            "category": ('Food_Category', None),
+            "calories_per_100g": ('Calories_per_100g', None),
+            "processing_level": ('Processing_Level', None),
+            "nutritional_density": ('Nutritional_Density', None)
+        }, id_key="id")
         
         return jsonify({
             "query": query,
@@ -182,6 +166,89 @@ def search_food():
         logger.error(f"Error searching food: {e}")
         return jsonify({"error": "Failed to search food items"}), 500
 
+@app.route("/api/food/autocomplete", methods=["GET"])
+def autocomplete_food():
+    """Prefix completions over food names and categories for search-as-you-type"""
+    try:
+        prefix = request.args.get("query", "")
+        limit = min(max(request.args.get("limit", 8, type=int), 1), 25)
+        
+        if food_db is None:
+            return jsonify({"error": "Food database not loaded"}), 500
+        
+        row_ids = food_catalog.autocomplete(prefix, limit=limit)
+        matches = food_catalog.rows(row_ids)
+        results = [
+            {"id": row_id, "name": name, "category": category}
+            for row_id, name, category in zip(row_ids, matches['Food_Name'], matches['Food_Category'])
+        ]
+        
+        return jsonify({
+            "query": prefix,
+            "results": results,
+            "total_found": len(results)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error autocompleting food: {e}")
+        return jsonify({"error": "Failed to autocomplete food items"}), 500
+
+@app.route("/api/food/filter", methods=["GET"])
+def filter_food():
+    """Filter food items by nutrient ranges and category, e.g. ?protein_min=20&sugar_max=5&category=Dairy"""
+    try:
+        if food_db is None:
+            return jsonify({"error": "Food database not loaded"}), 500
+        
+        try:
+            filters = parse_filter_args(request.args)
+            limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+            offset = max(request.args.get("cursor", 0, type=int), 0)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        row_ids = food_catalog.filter(**filters)
+        page = row_ids[offset:offset + limit]
+        next_offset = offset + len(page)
+        
+        return jsonify({
+            "results": food_catalog.serialize(page, NUTRIENT_RESULT_FIELDS, id_key="id"),
+            "total_found": len(row_ids),
+            "next_cursor": str(next_offset) if next_offset < len(row_ids) else None
+        })
+    
+    except Exception as e:
+        logger.error(f"Error filtering food: {e}")
+        return jsonify({"error": "Failed to filter food items"}), 500
+
+@app.route("/api/food/<int:food_id>/similar", methods=["GET"])
+def similar_foods(food_id):
+    """Get the nutritionally closest food items, optionally only healthier ones"""
+    try:
+        if food_db is None:
+            return jsonify({"error": "Food database not loaded"}), 500
+        
+        if food_id >= len(food_catalog):
+            return jsonify({"error": "Food item not found"}), 404
+        
+        k = min(max(request.args.get("k", 5, type=int), 1), 50)
+        healthier = request.args.get("healthier", "false").lower() == "true"
+        neighbors = food_catalog.similar(food_id, k=k, healthier=healthier)
+        results = food_catalog.serialize([row_id for row_id, _ in neighbors], NUTRIENT_RESULT_FIELDS, id_key="id")
+        for result, (_, distance) in zip(results, neighbors):
+            result["distance"] = round(distance, 4)
+        
+        return jsonify({
+            "food_id": food_id,
+            "name": food_catalog.names[food_id],
+            "results": results,
+            "total_found": len(results)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error finding similar foods: {e}")
+        return jsonify({"error": "Failed to find similar food items"}), 500
+
 @app.route("/api/food/details/<int:food_id>", methods=["GET"])
 def get_food_details(food_id):
     """Get detailed information about a specific food item"""
@@ -189,7 +256,7 @@ def get_food_details(food_id):
         if food_db is None:
             return jsonify({"error": "Food database not loaded"}), 500
         
-        food_item = food_db.iloc[food_id]
+        food_item = food_catalog.record(food_id)
         
         details = {
             "id": food_id,
@@ -310,42 +377,17 @@ def predict_disease_risk():
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        # Load original dataset for encoding reference
-        original_df = pd.read_csv("data/custom_nutrition_dataset.csv", encoding='utf-8', errors='ignore')
-        feature_cols = [c for c in original_df.columns if c != "Disease"]
-        
-        # Prepare user data
-        user_data = {}
-        for col in feature_cols:
-            if col in data:
-                user_data[col] = data[col]
-            else:
-                # Use default values from dataset
-                user_data[col] = original_df[col].mode()[0] if original_df[col].dtype == 'object' else original_df[col].mean()
-        
-        # Create DataFrame
-        user_df = pd.DataFrame([user_data])
-        
-        # Encode categorical features
-        encoded_df = encode_categorical_features(user_df, original_df)
-        
         # Make prediction
-        if model and label_encoder_y:
-            prediction = model.predict(encoded_df)
-            probabilities = model.predict_proba(encoded_df)[0]
-            max_prob = max(probabilities)
-            predicted_disease = label_encoder_y.inverse_transform(prediction)[0]
-            
-            # Get all disease probabilities
-            all_probabilities = {}
-            for i, disease in enumerate(label_encoder_y.classes_):
-                all_probabilities[disease] = float(probabilities[i])
+        user_model = model_registry.get("user")
+        if user_model:
+            # Prepare user data, filling missing features from the training-time defaults
+            user_data = user_model.with_defaults(data)
+            prediction = user_model.predict_one(user_data)
+            predicted_disease = prediction["predicted_disease"]
             
             result = {
-                "predicted_disease": predicted_disease,
-                "confidence": float(max_prob),
-                "all_probabilities": all_probabilities,
-                "risk_level": get_risk_level(max_prob),
+                **prediction,
+                "risk_level": get_risk_level(prediction["confidence"]),
                 "recommendations": get_disease_recommendations(predicted_disease),
                 "user_profile": user_data
             }
@@ -354,6 +396,8 @@ def predict_disease_risk():
         else:
             return jsonify({"error": "Prediction model not available"}), 500
     
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error predicting disease risk: {e}")
         return jsonify({"error": "Failed to predict disease risk"}), 500
@@ -641,6 +685,9 @@ def home():
             "health": "/api/health",
             "dashboard": "/api/dashboard/overview",
             "food_search": "/api/food/search",
+            "food_autocomplete": "/api/food/autocomplete",
+            "food_filter": "/api/food/filter",
+            "food_similar": "/api/food/<id>/similar",
             "food_scanner": "/api/scanner/analyze-image",
             "health_analysis": "/api/health/predict-disease",
             "profile": "/api/profile/health-metrics"
@@ -654,6 +701,8 @@ if __name__ == "__main__":
     print("   • Health Check: GET /api/health")
     print("   • Dashboard: GET /api/dashboard/overview")
     print("   • Food Search: GET /api/food/search?query=<food_name>")
+    print("   • Food Autocomplete: GET /api/food/autocomplete?query=<prefix>")
+    print("   • Food Filter: GET /api/food/filter?protein_min=<g>&sugar_max=<g>&category=<category>")
     print("   • Image Analysis: POST /api/scanner/analyze-image")
     print("   • Disease Prediction: POST /api/health/predict-disease")
     print("   • Health Metrics: GET/POST /api/profile/health-metrics")
@@ -5,8 +5,10 @@ Minimal version to handle encoding issues
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import logging
+from food_catalog import get_food_catalog
+from inference import USER_MODEL_FILES, load_user_risk_model
+from model_registry import ModelRegistry
 import os
 from datetime import datetime
 
@@ -19,34 +21,30 @@ CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])
 
 # Global variables
 food_db = None
+food_catalog = None
 model_loaded = False
+# Reloads the model in the background when its files change (MODEL_RELOAD_INTERVAL seconds, 0 disables)
+model_registry = ModelRegistry.from_env()
 
 def load_data_safely():
     """Load data with proper encoding handling"""
-    global food_db, model_loaded
+    global food_db, food_catalog, model_loaded
     
     try:
         logger.info("Loading data...")
         
-        # Try to load food database with different encodings
-        for encoding in ['utf-8', 'latin-1', 'cp1252']:
-            try:
-                food_db = pd.read_csv("data/food_database.csv", encoding=encoding)
-                logger.info(f"Food database loaded with {len(food_db)} entries using {encoding} encoding")
-                break
-            except Exception as e:
-                logger.warning(f"Failed to load with {encoding}: {e}")
-                continue
-        
-        if food_db is None:
-            logger.warning("Could not load food database")
+        # Load food database (the catalog tries utf-8, latin-1 and cp1252 in turn)
+        try:
+            food_catalog = get_food_catalog("data/food_database.csv")
+            food_db = food_catalog.df
+        except Exception as e:
+            logger.warning(f"Could not load food database: {e}")
         
         # Try to load models (optional)
         try:
-            import pickle
-            model = pickle.load(open("models/xgboost_model.pkl", "rb"))
+            model_registry.register("user", load_user_risk_model, USER_MODEL_FILES)
             model_loaded = True
-            logger.info("XGBoost model loaded successfully")
+            logger.info(f"XGBoost model loaded successfully (version {model_registry.version('user')})")
         except Exception as e:
             logger.warning(f"Could not load model: {e}")
             model_loaded = False
@@ -84,7 +82,8 @@ def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "data_loaded": food_db is not None,
-        "model_loaded": model_loaded
+        "model_loaded": model_loaded,
+        "models": model_registry.info()
     })
 
 @app.route("/api/food/search", methods=["GET"])
@@ -104,20 +103,14 @@ def search_food():
             })
         
         # Search in food database
-        query_lower = query.lower()
-        matches = food_db[
-            food_db['Food_Name'].str.lower().str.contains(query_lower, na=False)
-        ]
+        row_ids = food_catalog.search(query, limit=20)
         
         # Format results
-        results = []
-        for _, row in matches.head(20).iterrows():
-            results.append({
-                "id": int(row.name),
-                "name": str(row['Food_Name']),
-                "category": str(row.get('Food_Category', 'Unknown')),
-                "calories_per_100g": float(row.get('Calories_per_100g', 0)) if pd.notnull(row.get('Calories_per_100g')) else 0
-            })
+        results = food_catalog.serialize(row_ids, {
+            "name": ('Food_Name', None),
+            "category": ('Food_Category', None),
+            "calories_per_100g": ('Calories_per_100g', float)
+        }, id_key="id")
         
         return jsonify({
             "query": query,
@@ -212,14 +205,13 @@ def predict_disease():
         predicted_disease = "Low Risk"
         confidence = 0.85
         
-        # If model is loaded, try to use it
-        if model_loaded:
+        # If model is loaded, use it (omitted features fall back to training-time defaults)
+        user_model = model_registry.get("user")
+        if user_model:
             try:
-                import pickle
-                model = pickle.load(open("models/xgboost_model.pkl", "rb"))
-                # Add actual prediction logic here when data format is confirmed
-                predicted_disease = "Diabetes"  # Mock result
-                confidence = 0.78
+                prediction = user_model.predict_one(user_model.with_defaults(data))
+                predicted_disease = prediction["predicted_disease"]
+                confidence = prediction["confidence"]
             except Exception as e:
                 logger.warning(f"Model prediction failed: {e}")
         
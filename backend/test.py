@@ -1,24 +1,20 @@
 import pickle
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from inference import encode_category, load_category_lookups
 
 def load_model_and_encoders():
     """Load the trained model and label encoders"""
     model = pickle.load(open("models/xgboost_model.pkl", "rb"))
     label_encoder_y = pickle.load(open("models/label_encoder_y.pkl", "rb"))
-    return model, label_encoder_y
+    feature_lookups = load_category_lookups("models/user_feature_lookups.pkl")
+    return model, label_encoder_y, feature_lookups
 
-def encode_categorical_features(test_df, original_df):
-    """Encode categorical features using the same encoding as training"""
+def encode_categorical_features(test_df, feature_lookups):
+    """Encode categorical features using the persisted training lookups"""
     encoded_df = test_df.copy()
-    categorical_cols = encoded_df.select_dtypes(include=["object"]).columns
-    
-    for col in categorical_cols:
-        if col in original_df.columns:
-            le = LabelEncoder()
-            le.fit(original_df[col].astype(str))
-            encoded_df[col] = le.transform(encoded_df[col].astype(str))
-    
+    for col, lookup in feature_lookups.items():
+        if col in encoded_df.columns:
+            encoded_df[col] = [encode_category(lookup, value) for value in encoded_df[col]]
     return encoded_df
 
 def test_single_prediction():
@@ -27,7 +23,7 @@ def test_single_prediction():
     print("=" * 50)
     
     # Load model and encoders
-    model, label_encoder_y = load_model_and_encoders()
+    model, label_encoder_y, feature_lookups = load_model_and_encoders()
     
     # Load dataset to get column names
     df = pd.read_csv("data/custom_nutrition_dataset.csv")
@@ -47,7 +43,7 @@ def test_single_prediction():
         sample[col] = sample[col].astype(df[col].dtype)
 
     # Encode categorical features
-    encoded_sample = encode_categorical_features(sample, df)
+    encoded_sample = encode_categorical_features(sample, feature_lookups)
 
     # Predict
     pred = model.predict(encoded_sample)
@@ -64,7 +60,7 @@ def test_comprehensive_cases():
     print("=" * 60)
     
     # Load model and encoders
-    model, label_encoder_y = load_model_and_encoders()
+    model, label_encoder_y, feature_lookups = load_model_and_encoders()
     df = pd.read_csv("data/custom_nutrition_dataset.csv")
     feature_cols = [c for c in df.columns if c != "Disease"]
     
@@ -158,7 +154,7 @@ def test_comprehensive_cases():
         test_df = test_df[feature_cols]
         
         # Encode categorical features
-        encoded_test_df = encode_categorical_features(test_df, df)
+        encoded_test_df = encode_categorical_features(test_df, feature_lookups)
         
         # Make prediction
         try:
@@ -185,7 +181,7 @@ def test_from_csv():
     
     try:
         # Load model and encoders
-        model, label_encoder_y = load_model_and_encoders()
+        model, label_encoder_y, feature_lookups = load_model_and_encoders()
         original_df = pd.read_csv("data/custom_nutrition_dataset.csv")
         feature_cols = [c for c in original_df.columns if c != "Disease"]
         
@@ -204,7 +200,7 @@ def test_from_csv():
             sample_df = sample_df[feature_cols]
             
             # Encode categorical features
-            encoded_sample = encode_categorical_features(sample_df, original_df)
+            encoded_sample = encode_categorical_features(sample_df, feature_lookups)
             
             # Make prediction
             prediction = model.predict(encoded_sample)
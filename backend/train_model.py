@@ -3,20 +3,46 @@ from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
+import numpy as np
 import pickle
 import os
+from inference import (
+    NativeBooster, build_category_lookups, build_feature_defaults, export_native_model, export_onnx_model,
+    USER_NATIVE_MODEL, USER_NATIVE_META, FOOD_NATIVE_MODEL, FOOD_NATIVE_META, USER_ONNX_MODEL, FOOD_ONNX_MODEL,
+    USER_CATEGORICAL_MODEL, USER_CATEGORICAL_META, FOOD_CATEGORICAL_MODEL, FOOD_CATEGORICAL_META
+)
+from inference_benchmark import benchmark
 
-def train_user_model():
-    print("🔵 Training user nutrition model...")
+def load_user_training_data():
+    """User nutrition dataset with label-encoded features, in the form train_user_model fits on"""
     df = pd.read_csv("data/custom_nutrition_dataset.csv")
     target_col = "Disease"
     X = df.drop(columns=[target_col])
     y = df[target_col]
+    label_encoders = {}
     for col in X.select_dtypes(include=["object"]).columns:
         le = LabelEncoder()
         X[col] = le.fit_transform(X[col].astype(str))
+        label_encoders[col] = le
     label_encoder_y = LabelEncoder()
     y = label_encoder_y.fit_transform(y.astype(str))
+    return df, X, y, label_encoder_y, label_encoders
+
+def save_user_model(model, label_encoder_y, label_encoders, df, feature_cols=None):
+    os.makedirs("models", exist_ok=True)
+    pickle.dump(model, open("models/xgboost_model.pkl", "wb"))
+    pickle.dump(label_encoder_y, open("models/label_encoder_y.pkl", "wb"))
+    save_user_serving_artifacts(model, label_encoder_y, label_encoders, df, feature_cols)
+    print("\n💾 User model saved to models/xgboost_model.pkl")
+    print("💾 User target label encoder saved to models/label_encoder_y.pkl")
+    print("💾 User feature lookups saved to models/user_feature_lookups.pkl")
+    print("💾 User feature names saved to models/user_feature_names.pkl")
+    print("💾 User feature defaults saved to models/user_feature_defaults.pkl")
+    print(f"💾 User native booster saved to {USER_NATIVE_MODEL} (metadata: {USER_NATIVE_META})")
+
+def train_user_model():
+    print("🔵 Training user nutrition model...")
+    df, X, y, label_encoder_y, label_encoders = load_user_training_data()
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
@@ -34,18 +60,47 @@ def train_user_model():
     y_pred = model.predict(X_test)
     print("\n✅ Accuracy:", accuracy_score(y_test, y_pred))
     print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
-    os.makedirs("models", exist_ok=True)
-    pickle.dump(model, open("models/xgboost_model.pkl", "wb"))
-    pickle.dump(label_encoder_y, open("models/label_encoder_y.pkl", "wb"))
-    print("\n💾 User model saved to models/xgboost_model.pkl")
-    print("💾 User target label encoder saved to models/label_encoder_y.pkl")
+    save_user_model(model, label_encoder_y, label_encoders, df)
 
-def train_food_model():
-    print("🍎 Training food label model...")
+def refresh_onnx_model(native_path, onnx_path):
+    """Re-export an ONNX model that already exists so it never serves a stale booster"""
+    if not os.path.exists(onnx_path):
+        return
+    try:
+        export_onnx_model(NativeBooster(native_path).booster, onnx_path)
+        print(f"💾 {onnx_path} refreshed")
+    except ImportError:
+        os.remove(onnx_path)
+        print(f"⚠️ onnxmltools not installed; removed stale {onnx_path}")
+
+def save_user_serving_artifacts(model, label_encoder_y, label_encoders, df, feature_cols=None):
+    """Lookups, feature order, defaults and the native booster export for the user model"""
+    if feature_cols is None:
+        feature_cols = [c for c in df.columns if c != "Disease"]
+    lookups = build_category_lookups(label_encoders, df)
+    defaults = build_feature_defaults(df, feature_cols)
+    pickle.dump(lookups, open("models/user_feature_lookups.pkl", "wb"))
+    pickle.dump(feature_cols, open("models/user_feature_names.pkl", "wb"))
+    pickle.dump(defaults, open("models/user_feature_defaults.pkl", "wb"))
+    export_native_model(
+        model, label_encoder_y.classes_, feature_cols, lookups,
+        USER_NATIVE_MODEL, USER_NATIVE_META, defaults=defaults
+    )
+    refresh_onnx_model(USER_NATIVE_MODEL, USER_ONNX_MODEL)
+
+def save_food_serving_artifacts(model, label_encoder_y, label_encoders, feature_cols, df):
+    """Lookups and the native booster export for the food model"""
+    lookups = build_category_lookups(label_encoders, df)
+    pickle.dump(lookups, open("models/food_feature_lookups.pkl", "wb"))
+    export_native_model(model, label_encoder_y.classes_, feature_cols, lookups, FOOD_NATIVE_MODEL, FOOD_NATIVE_META)
+    refresh_onnx_model(FOOD_NATIVE_MODEL, FOOD_ONNX_MODEL)
+
+def load_food_training_data():
+    """Food database with label-encoded features, in the form train_food_model fits on"""
     df = pd.read_csv("data/food_database_fixed.csv")
     target_col = "Disease_Risk"
     feature_cols = [col for col in df.columns if col not in [target_col, 'Food_Name']]
-    X = df[feature_cols]
+    X = df[feature_cols].copy()
     y = df[target_col]
     categorical_cols = X.select_dtypes(include=["object"]).columns
     label_encoders = {}
@@ -55,6 +110,25 @@ def train_food_model():
         label_encoders[col] = le
     label_encoder_y = LabelEncoder()
     y = label_encoder_y.fit_transform(y.astype(str))
+    return df, X, y, label_encoder_y, label_encoders
+
+def save_food_model(model, label_encoder_y, label_encoders, df, feature_cols):
+    os.makedirs("models", exist_ok=True)
+    pickle.dump(model, open("models/food_analysis_model.pkl", "wb"))
+    pickle.dump(label_encoder_y, open("models/food_label_encoder_y.pkl", "wb"))
+    pickle.dump(label_encoders, open("models/food_feature_encoders.pkl", "wb"))
+    pickle.dump(feature_cols, open("models/food_feature_names.pkl", "wb"))
+    save_food_serving_artifacts(model, label_encoder_y, label_encoders, feature_cols, df)
+    print(f"\n💾 Food model saved to models/food_analysis_model.pkl")
+    print(f"💾 Food target encoder saved to models/food_label_encoder_y.pkl")
+    print(f"💾 Food feature encoders saved to models/food_feature_encoders.pkl")
+    print(f"💾 Food feature names saved to models/food_feature_names.pkl")
+    print(f"💾 Food feature lookups saved to models/food_feature_lookups.pkl")
+    print(f"💾 Food native booster saved to {FOOD_NATIVE_MODEL} (metadata: {FOOD_NATIVE_META})")
+
+def train_food_model():
+    print("🍎 Training food label model...")
+    df, X, y, label_encoder_y, label_encoders = load_food_training_data()
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
@@ -73,24 +147,236 @@ def train_food_model():
     print(f"\n✅ Model Accuracy: {accuracy_score(y_test, y_pred):.3f}")
     print(f"\n📊 Classification Report:")
     print(classification_report(y_test, y_pred, target_names=label_encoder_y.classes_))
+    save_food_model(model, label_encoder_y, label_encoders, df, list(X.columns))
+
+COMPACT_TREE_CANDIDATES = [10, 25, 50, 75, 100, 150, 200, 300, 500]
+
+def latency_accuracy_frontier(booster, X_test, y_test, tree_counts):
+    """
+    Accuracy and single-row latency of the booster truncated to each number of boosting rounds.
+
+    Returns:
+        list: One dict per round count with rounds, accuracy, p50_ms and p99_ms
+    """
+    X_test = np.asarray(X_test, dtype=np.float32)
+    frontier = []
+    for rounds in tree_counts:
+        truncated = booster[:rounds]
+        probabilities = truncated.inplace_predict(X_test, validate_features=False)
+        accuracy = accuracy_score(y_test, np.asarray(probabilities).argmax(axis=1))
+        latency = benchmark(lambda row: truncated.inplace_predict(row, validate_features=False), X_test)
+        frontier.append({"rounds": rounds, "accuracy": accuracy, **latency})
+    return frontier
+
+def train_compact_model(kind, accuracy_tolerance=0.005, prune_gain_share=0.0, max_rounds=1000, save=False):
+    """
+    Latency-aware training: hist trees, early stopping and optional gain-based feature pruning.
+
+    Args:
+        kind (str): "user" or "food"
+        accuracy_tolerance (float): Accuracy the shipped model may give up against the best round count
+        prune_gain_share (float): Drop features contributing less than this share of the summed split gain
+            over all trees (importance_type="total_gain"; 0 keeps all)
+        max_rounds (int): Upper bound on boosting rounds before early stopping
+        save (bool): Refit on the full training split at the chosen round count and overwrite the model artifacts
+
+    Returns:
+        list: The latency/accuracy frontier
+    """
+    print(f"⚡ Training compact {kind} model...")
+    df, X, y, label_encoder_y, label_encoders = (
+        load_user_training_data() if kind == "user" else load_food_training_data()
+    )
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    # Early stopping watches a validation split carved out of the training data
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+    )
+    params = dict(
+        learning_rate=0.1,
+        max_depth=6,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        random_state=42,
+        tree_method="hist",
+        eval_metric="mlogloss"
+    )
+
+    def fit(columns):
+        model = XGBClassifier(n_estimators=max_rounds, early_stopping_rounds=20, **params)
+        model.fit(X_fit[columns], y_fit, eval_set=[(X_val[columns], y_val)], verbose=False)
+        return model
+
+    feature_cols = list(X.columns)
+    model = fit(feature_cols)
+    if prune_gain_share > 0:
+        gain = model.get_booster().get_score(importance_type="total_gain")
+        total_gain = sum(gain.values())
+        kept = [col for col in feature_cols if gain.get(col, 0.0) / total_gain >= prune_gain_share]
+        print(f"✂️ Pruned {len(feature_cols) - len(kept)} of {len(feature_cols)} features: "
+              f"{[col for col in feature_cols if col not in kept]}")
+        feature_cols = kept
+        model = fit(feature_cols)
+
+    best_rounds = model.best_iteration + 1
+    n_classes = len(label_encoder_y.classes_)
+    print(f"🛑 Early stopping kept {best_rounds} of {max_rounds} rounds ({best_rounds * n_classes} trees)")
+    tree_counts = sorted({rounds for rounds in COMPACT_TREE_CANDIDATES if rounds < best_rounds} | {best_rounds})
+    frontier = latency_accuracy_frontier(model.get_booster(), X_test[feature_cols], y_test, tree_counts)
+
+    best_accuracy = max(point["accuracy"] for point in frontier)
+    chosen = next(point for point in frontier if point["accuracy"] >= best_accuracy - accuracy_tolerance)
+    print(f"\n📈 Latency/accuracy frontier ({len(feature_cols)} features):")
+    print(f"{'rounds':>8} {'trees':>7} {'accuracy':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for point in frontier:
+        marker = "  ⬅ smallest within tolerance" if point is chosen else ""
+        print(f"{point['rounds']:>8} {point['rounds'] * n_classes:>7} {point['accuracy']:>10.3f} {point['p50_ms']:>9.3f} {point['p99_ms']:>9.3f}{marker}")
+
+    if save:
+        # The validation split was only needed to pick the round count; refit on all training rows
+        final = XGBClassifier(n_estimators=chosen["rounds"], **params)
+        final.fit(X_train[feature_cols], y_train)
+        print(f"\n✅ Shipped model ({chosen['rounds']} rounds, refit on train + validation) accuracy: "
+              f"{accuracy_score(y_test, final.predict(X_test[feature_cols])):.3f} "
+              f"(frontier row: {chosen['accuracy']:.3f})")
+        if kind == "user":
+            save_user_model(final, label_encoder_y, label_encoders, df, feature_cols)
+        else:
+            save_food_model(final, label_encoder_y, label_encoders, df, feature_cols)
+    return frontier
+
+def load_categorical_training_data(kind):
+    """Training data with object columns as pandas category dtype instead of label-encoded integers"""
+    if kind == "user":
+        df = pd.read_csv("data/custom_nutrition_dataset.csv")
+        target_col = "Disease"
+        feature_cols = [c for c in df.columns if c != target_col]
+    else:
+        df = pd.read_csv("data/food_database_fixed.csv")
+        target_col = "Disease_Risk"
+        feature_cols = [col for col in df.columns if col not in [target_col, 'Food_Name']]
+    X = df[feature_cols].copy()
+    for col in X.select_dtypes(include=["object"]).columns:
+        X[col] = X[col].astype(str).astype("category")
+    label_encoder_y = LabelEncoder()
+    y = label_encoder_y.fit_transform(df[target_col].astype(str))
+    return df, X, y, label_encoder_y
+
+def train_categorical_model(kind, save=False):
+    """
+    Train with XGBoost's native categorical handling, so serving needs no feature encoders.
+
+    Categorical columns are fed to XGBoost as their category codes and their
+    training categories are written to the metadata, so the booster stays
+    loadable by XGBoost versions that cannot store categories in the model
+    (MODEL_FORMAT=categorical).
+
+    Args:
+        kind (str): "user" or "food"
+        save (bool): Write the native booster and metadata for MODEL_FORMAT=categorical
+    """
+    print(f"🏷️ Training {kind} model with native categorical features...")
+    df, X, y, label_encoder_y = load_categorical_training_data(kind)
+    categories = {col: [str(c) for c in X[col].cat.categories] for col in X.select_dtypes(include=["category"]).columns}
+    feature_types = ["c" if col in categories else "q" for col in X.columns]
+    for col in categories:
+        X[col] = X[col].cat.codes.astype("float32")
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    model = XGBClassifier(
+        n_estimators=200,
+        learning_rate=0.1,
+        max_depth=6,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        random_state=42,
+        tree_method="hist",
+        enable_categorical=True,
+        feature_types=feature_types,
+        eval_metric="mlogloss"
+    )
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    print(f"\n✅ Model Accuracy: {accuracy_score(y_test, y_pred):.3f}")
+    print(f"\n📊 Classification Report:")
+    print(classification_report(
+        y_test, y_pred, labels=range(len(label_encoder_y.classes_)),
+        target_names=label_encoder_y.classes_, zero_division=0
+    ))
+    if save:
+        os.makedirs("models", exist_ok=True)
+        feature_cols = list(X.columns)
+        model_path, meta_path = (
+            (USER_CATEGORICAL_MODEL, USER_CATEGORICAL_META) if kind == "user"
+            else (FOOD_CATEGORICAL_MODEL, FOOD_CATEGORICAL_META)
+        )
+        defaults = build_feature_defaults(df, feature_cols) if kind == "user" else None
+        export_native_model(
+            model, label_encoder_y.classes_, feature_cols, None, model_path, meta_path,
+            defaults=defaults, categories=categories
+        )
+        print(f"💾 Categorical {kind} model saved to {model_path} (metadata: {meta_path})")
+    return model
+
+def export_serving_artifacts():
+    """Write the lookup, default and native booster artifacts for already-trained models without retraining"""
+    print("🔤 Exporting serving artifacts...")
     os.makedirs("models", exist_ok=True)
-    pickle.dump(model, open("models/food_analysis_model.pkl", "wb"))
-    pickle.dump(label_encoder_y, open("models/food_label_encoder_y.pkl", "wb"))
-    pickle.dump(label_encoders, open("models/food_feature_encoders.pkl", "wb"))
-    pickle.dump(feature_cols, open("models/food_feature_names.pkl", "wb"))
-    print(f"\n💾 Food model saved to models/food_analysis_model.pkl")
-    print(f"💾 Food target encoder saved to models/food_label_encoder_y.pkl")
-    print(f"💾 Food feature encoders saved to models/food_feature_encoders.pkl")
-    print(f"💾 Food feature names saved to models/food_feature_names.pkl")
+    df = pd.read_csv("data/custom_nutrition_dataset.csv")
+    X = df.drop(columns=["Disease"])
+    # train_user_model fits its encoders on the full dataset, so refitting reproduces them
+    label_encoders = {
+        col: LabelEncoder().fit(X[col].astype(str))
+        for col in X.select_dtypes(include=["object"]).columns
+    }
+    model = pickle.load(open("models/xgboost_model.pkl", "rb"))
+    label_encoder_y = pickle.load(open("models/label_encoder_y.pkl", "rb"))
+    save_user_serving_artifacts(model, label_encoder_y, label_encoders, df)
+    print("💾 User feature lookups, names and defaults saved to models/user_feature_*.pkl")
+    print(f"💾 User native booster saved to {USER_NATIVE_MODEL} (metadata: {USER_NATIVE_META})")
+    df = pd.read_csv("data/food_database_fixed.csv")
+    model = pickle.load(open("models/food_analysis_model.pkl", "rb"))
+    label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
+    label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
+    feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
+    save_food_serving_artifacts(model, label_encoder_y, label_encoders, feature_cols, df)
+    print("💾 Food feature lookups saved to models/food_feature_lookups.pkl")
+    print(f"💾 Food native booster saved to {FOOD_NATIVE_MODEL} (metadata: {FOOD_NATIVE_META})")
+
+def export_onnx_models():
+    """Convert the exported native boosters to ONNX for INFERENCE_ENGINE=onnx (requires onnxmltools)"""
+    print("📦 Exporting ONNX models...")
+    for native_path, onnx_path in [(USER_NATIVE_MODEL, USER_ONNX_MODEL), (FOOD_NATIVE_MODEL, FOOD_ONNX_MODEL)]:
+        export_onnx_model(NativeBooster(native_path).booster, onnx_path)
+        print(f"💾 {native_path} converted to {onnx_path}")
 
 if __name__ == "__main__":
     print("Select model to train:")
     print("1. User nutrition model")
     print("2. Food label model")
-    choice = input("Enter 1 or 2: ").strip()
+    print("3. Export serving artifacts for existing models")
+    print("4. Export ONNX models (after option 3 or training)")
+    print("5. Compact model (hist trees, early stopping, latency/accuracy frontier)")
+    print("6. Native categorical model (no feature encoders at serving time)")
+    choice = input("Enter 1-6: ").strip()
     if choice == "1":
         train_user_model()
     elif choice == "2":
         train_food_model()
+    elif choice == "3":
+        export_serving_artifacts()
+    elif choice == "4":
+        export_onnx_models()
+    elif choice == "5":
+        kind = input("Model (user/food): ").strip().lower()
+        prune = float(input("Prune features below this share of total gain (0 keeps all): ").strip() or 0)
+        save = input("Save the smallest model within tolerance? (y/N): ").strip().lower() == "y"
+        train_compact_model(kind, prune_gain_share=prune, save=save)
+    elif choice == "6":
+        kind = input("Model (user/food): ").strip().lower()
+        train_categorical_model(kind, save=True)
     else:
         print("Invalid choice.")
\ No newline at end of file
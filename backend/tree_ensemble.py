@@ -0,0 +1,149 @@
+"""
+Pure-NumPy evaluator for trained XGBoost tree ensembles
+Flattens every tree of a booster into contiguous node arrays and walks all trees
+for all rows at once, avoiding XGBoost's per-call overhead on single-row requests
+"""
+
+import json
+import numpy as np
+
+
+def _parse_base_score(value, num_class):
+    """learner_model_param base_score, stored as '5E-1' or a vector '[5E-1,5E-1]'"""
+    values = [float(v) for v in value.strip("[]").split(",")]
+    if len(values) == 1:
+        values = values * num_class
+    return np.asarray(values, dtype=np.float64)
+
+
+class CompiledEnsemble:
+    """Gradient-boosted trees as flat NumPy arrays, evaluated with vectorized traversal"""
+
+    def __init__(self, model_json):
+        """
+        Build the node arrays from a booster's JSON model.
+
+        Args:
+            model_json (dict): Parsed output of Booster.save_raw('json')
+
+        Raises:
+            ValueError: If the objective is not supported
+        """
+        learner = model_json["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in ("multi:softprob", "multi:softmax", "binary:logistic"):
+            raise ValueError(f"Unsupported objective: {objective}")
+        self.objective = objective
+        param = learner["learner_model_param"]
+        self.num_class = max(1, int(param["num_class"]))
+        self.num_feature = int(param["num_feature"])
+        base_score = _parse_base_score(param["base_score"], self.num_class)
+        if objective == "binary:logistic":
+            # Binary base_score is a probability; margins live in logit space
+            base_score = np.log(base_score / (1.0 - base_score))
+        self.base_margin = base_score
+
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster: {booster['name']}")
+        trees = booster["model"]["trees"]
+        tree_info = booster["model"]["tree_info"]
+
+        features, thresholds, lefts, rights, default_left, values, roots = [], [], [], [], [], [], []
+        # Categorical splits: node -> row of category sets (-1 for numeric splits)
+        category_rows = []
+        category_sets = []
+        offset = 0
+        depth = 0
+        for tree in trees:
+            rows = np.full(len(tree["left_children"]), -1, dtype=np.int64)
+            for node, start, size in zip(tree["categories_nodes"], tree["categories_segments"], tree["categories_sizes"]):
+                rows[node] = len(category_sets)
+                category_sets.append(tree["categories"][start:start + size])
+            category_rows.append(rows)
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            n_nodes = len(left)
+            node_ids = np.arange(n_nodes)
+            leaf = left == -1
+            # Leaves point at themselves so every row can take the same number of steps
+            lefts.append(np.where(leaf, node_ids, left) + offset)
+            rights.append(np.where(leaf, node_ids, right) + offset)
+            features.append(np.where(leaf, 0, tree["split_indices"]))
+            thresholds.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            # A leaf's split_conditions entry holds its output value
+            values.append(np.where(leaf, tree["split_conditions"], 0.0))
+            roots.append(offset)
+            depth = max(depth, self._depth(left, right))
+            offset += n_nodes
+
+        self.feature = np.concatenate(features).astype(np.int64)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.default_left = np.concatenate(default_left)
+        self.value = np.concatenate(values).astype(np.float64)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = depth
+        self.category_row = np.concatenate(category_rows)
+        n_categories = max((max(cats) + 1 for cats in category_sets if cats), default=0)
+        self.category_sets = np.zeros((len(category_sets), max(n_categories, 1)), dtype=bool)
+        for row, cats in enumerate(category_sets):
+            self.category_sets[row, cats] = True
+        self.has_categorical = bool(len(category_sets))
+        # Tree -> output group as a one-hot matrix so leaf sums become one matmul
+        self.tree_groups = np.zeros((len(trees), self.num_class), dtype=np.float64)
+        self.tree_groups[np.arange(len(trees)), tree_info] = 1.0
+
+    @staticmethod
+    def _depth(left, right):
+        depth = 0
+        frontier = [0]
+        while frontier:
+            frontier = [child for node in frontier for child in (left[node], right[node]) if child != -1]
+            if frontier:
+                depth += 1
+        return depth
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Compile an xgboost.Booster"""
+        return cls(json.loads(booster.save_raw("json")))
+
+    def __len__(self):
+        return len(self.roots)
+
+    def predict_margin(self, X):
+        """Raw per-class margins for an (n, n_features) matrix"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            # XGBoost sends x < threshold left and missing values to the default child
+            go_left = x < self.threshold[nodes]
+            if self.has_categorical:
+                # Categories in a categorical split's set go right; unseen codes go left
+                categorical_rows = self.category_row[nodes]
+                is_categorical = categorical_rows >= 0
+                codes = np.where(np.isnan(x), -1, x).astype(np.int64)
+                valid = (codes >= 0) & (codes < self.category_sets.shape[1])
+                in_set = valid & self.category_sets[np.maximum(categorical_rows, 0), np.where(valid, codes, 0)]
+                go_left = np.where(is_categorical, ~in_set, go_left)
+            go_left = np.where(np.isnan(x), self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes] @ self.tree_groups + self.base_margin
+
+    def predict_proba(self, X):
+        """Class probabilities for an (n, n_features) matrix, matching XGBClassifier.predict_proba"""
+        margin = self.predict_margin(X)
+        if self.objective == "binary:logistic":
+            positive = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        margin = margin - margin.max(axis=1, keepdims=True)
+        exp = np.exp(margin)
+        return exp / exp.sum(axis=1, keepdims=True)
+